@@ -1,9 +1,29 @@
 import os
+import sys
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Slotted dataclasses need Python 3.10+; older interpreters still get a frozen dataclass
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+_SYSTEM_PROMPT = sys.intern("""You are a helpful and knowledgeable AI assistant powered by OpenAI GPT-3.5-turbo. You are direct, honest, and don't sugarcoat reality. Your role is to:
+
+1. Answer questions with no very little fluff — give the user the answer they are looking for
+2. Provide accurate, reasoned, and well thoughout responses
+3. Assist with analysis, writing, problem-solving, and more. Provide details steps when requested. 
+4. Engage in real, unfiltered conversation — but stay within reason
+5. Help users learn and understand complex ideas, able to do so in layman terms
+
+Guidelines:
+- Be honest — even if it's uncomfortable
+- Stay factual and cut the BS
+- No fake politeness or empty niceties
+""")
+
+@dataclass(frozen=True, **_SLOTS)
 class Settings:
     # OpenAI Configuration
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
@@ -12,13 +32,24 @@ class Settings:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY", "")
     SUPABASE_SERVICE_ROLE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+    # JWT secret for verifying HS256 access tokens locally (Settings > API in Supabase)
+    SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET", "")
+    # Postgres connection string (optional, hot-path reads skip PostgREST when set)
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    # "transaction" or "session"; detected from the port (6543 = transaction) if unset
+    SUPABASE_POOLER_MODE: str = os.getenv("SUPABASE_POOLER_MODE", "").lower()
+    
+    # Redis Configuration (optional, enables conversation context caching)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
     
     # CORS Configuration
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
     
     # Server Configuration
+    ENV: str = os.getenv("ENV", "dev")  # "dev" enables auto-reload; anything else runs production workers
     PORT: int = int(os.getenv("PORT", "8000"))
     HOST: str = os.getenv("HOST", "0.0.0.0")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()  # DEBUG adds per-query service logs
     
     # API Configuration
     API_V1_PREFIX: str = "/api"
@@ -26,19 +57,14 @@ class Settings:
     VERSION: str = "1.0.0"
     
     # AI Assistant System Prompt
-    SYSTEM_PROMPT: str = """You are a helpful and knowledgeable AI assistant powered by OpenAI GPT-3.5-turbo. You are direct, honest, and don't sugarcoat reality. Your role is to:
-
-1. Answer questions with no very little fluff — give the user the answer they are looking for
-2. Provide accurate, reasoned, and well thoughout responses
-3. Assist with analysis, writing, problem-solving, and more. Provide details steps when requested. 
-4. Engage in real, unfiltered conversation — but stay within reason
-5. Help users learn and understand complex ideas, able to do so in layman terms
-
-Guidelines:
-- Be honest — even if it's uncomfortable
-- Stay factual and cut the BS
-- No fake politeness or empty niceties
-"""
+    SYSTEM_PROMPT: str = _SYSTEM_PROMPT
+    
+    # Prebuilt system message shared by every completion request (never mutate)
+    SYSTEM_MESSAGE: dict = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        """Build derived settings (frozen, so set through object.__setattr__)"""
+        object.__setattr__(self, "SYSTEM_MESSAGE", {"role": "system", "content": self.SYSTEM_PROMPT})
 
 
 
@@ -1,15 +1,19 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+import anyio
 import logging
 from contextlib import asynccontextmanager
 
 from app.config import settings
 from app.routers import chat
+from app.services.supabase_service import get_supabase_service
+from app.services.cache_service import context_cache
+from app.services.http_client import http_client
 
 # Set up logging
 logging.basicConfig(
-    level=logging.INFO,
+    level=settings.LOG_LEVEL,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
@@ -25,15 +29,38 @@ async def lifespan(app: FastAPI):
         settings.validate_config()
         logger.info("Configuration validated successfully")
     except Exception as e:
-        logger.error(f"Configuration validation failed: {str(e)}")
+        logger.error("Configuration validation failed: %s", e)
         raise e
     
+    # Supabase queries run on the worker thread pool; raise its cap from 40 to 100
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 100
+    
+    # Create the Supabase client and open its connection pool before the first request
+    supabase_service = get_supabase_service()
+    await supabase_service.warm_up()
+    
+    # Load signing keys so asymmetric JWTs can be verified without calling Supabase
+    await supabase_service.load_jwks()
+    
+    # Open the direct Postgres pool (no-op without DATABASE_URL)
+    await supabase_service.connect_db()
+    
+    # Start batching chat message inserts
+    await supabase_service.start_message_writer()
+    
+    # Connect the conversation context cache (no-op without REDIS_URL)
+    await context_cache.connect()
+    
     logger.info("Backend startup complete")
     
     yield
     
     # Shutdown
     logger.info("Shutting down CoutAI Backend...")
+    await context_cache.close()
+    await get_supabase_service().stop_message_writer()
+    await get_supabase_service().close_db()
+    await http_client.aclose()
 
 # Create FastAPI application
 app = FastAPI(
@@ -42,21 +69,24 @@ app = FastAPI(
     description="AI-powered fitness coaching backend API",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
+    # Set, so the per-request origin check is a hash lookup
+    allow_origins=frozenset([
         settings.FRONTEND_URL,
         "http://localhost:3000",  # Development frontend
         "https://localhost:3000",  # HTTPS development
         "http://127.0.0.1:3000",  # Alternative localhost
-    ],
+    ]),
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=[chat.NEXT_CURSOR_HEADER],
 )
 
 # Include routers
@@ -66,7 +96,7 @@ app.include_router(chat.router, prefix=settings.API_V1_PREFIX)
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler for unhandled errors"""
-    logger.error(f"Unhandled exception: {str(exc)}")
+    logger.error("Unhandled exception: %s", exc)
     return JSONResponse(
         status_code=500,
         content={"error": "Internal server error", "detail": "An unexpected error occurred"}
@@ -101,20 +131,14 @@ async def api_status():
         "status": "operational",
         "endpoints": {
             "chat": f"{settings.API_V1_PREFIX}/chat",
+            "chat_stream": f"{settings.API_V1_PREFIX}/chat/stream",
             "chat_history": f"{settings.API_V1_PREFIX}/chat/history",
             "health": "/health"
         }
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    
-    logger.info(f"Starting server on {settings.HOST}:{settings.PORT}")
+    # One launcher for both entry points, so their settings can't drift apart
+    from run import main
     
-    uvicorn.run(
-        "app.main:app",
-        host=settings.HOST,
-        port=settings.PORT,
-        reload=True,  # Enable auto-reload during development
-        log_level="info"
-    ) 
\ No newline at end of file
+    main()
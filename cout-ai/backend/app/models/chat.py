@@ -1,19 +1,49 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from typing import Optional, List, Tuple
+from datetime import datetime, timezone
+from uuid import UUID
+
+# Session titles derived from a first message keep this many characters
+SESSION_TITLE_MAX_LENGTH = 50
+
+# Recent conversation as parallel (user messages, AI responses) tuples, oldest first
+ConversationContext = Tuple[Tuple[str, ...], Tuple[str, ...]]
+EMPTY_CONTEXT: ConversationContext = ((), ())
+
+# Keyset position from an X-Next-Cursor header: (timestamp, row id), the id None
+# for cursors that carry only a timestamp
+KeysetCursor = Tuple[datetime, Optional[UUID]]
+
+_cursor_timestamp = TypeAdapter(datetime)
+
+def parse_cursor(value: str) -> KeysetCursor:
+    """Parse a "timestamp,id" (or bare timestamp) cursor, raising ValueError if it is malformed"""
+    timestamp, _, row_id = value.partition(",")
+    return _cursor_timestamp.validate_python(timestamp), UUID(row_id) if row_id else None
+
+def make_session_title(message: str) -> str:
+    """Build a session title from a message: its first 50 characters, with "..." if cut short"""
+    title = message[:SESSION_TITLE_MAX_LENGTH].strip()
+    return title + "..." if len(message) > SESSION_TITLE_MAX_LENGTH else title
+
+def utc_now() -> str:
+    """Current UTC time as an ISO 8601 string with millisecond precision and a Z suffix"""
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
 
 class ChatRequest(BaseModel):
     """Request model for chat endpoint"""
     message: str = Field(..., min_length=1, max_length=2000, description="User's message to the AI")
     session_id: Optional[str] = Field(None, description="Chat session ID (optional for new sessions)")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="forbid",
+        json_schema_extra={
             "example": {
                 "message": "I want to start working out but I'm a complete beginner. Can you help me create a simple routine?",
                 "session_id": "123e4567-e89b-12d3-a456-426614174000"
             }
         }
+    )
 
 class ChatResponse(BaseModel):
     """Response model for chat endpoint"""
@@ -22,8 +52,9 @@ class ChatResponse(BaseModel):
     session_id: Optional[str] = Field(None, description="Chat session ID (may be None if session creation failed)")
     session_title: Optional[str] = Field(None, description="Session title (included if session title was updated)")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="ignore",
+        json_schema_extra={
             "example": {
                 "message": "I'd be happy to help you start your fitness journey! For beginners, I recommend...",
                 "timestamp": "2024-01-01T12:00:00Z",
@@ -31,6 +62,7 @@ class ChatResponse(BaseModel):
                 "session_title": "How to start working out as a beginner"
             }
         }
+    )
 
 class ChatHistory(BaseModel):
     """Model for chat message history"""
@@ -41,8 +73,9 @@ class ChatHistory(BaseModel):
     ai_response: str = Field(..., description="AI's response")
     created_at: datetime = Field(..., description="Message creation timestamp")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="ignore",
+        json_schema_extra={
             "example": {
                 "id": "123e4567-e89b-12d3-a456-426614174000",
                 "user_id": "user-123",
@@ -52,6 +85,7 @@ class ChatHistory(BaseModel):
                 "created_at": "2024-01-01T12:00:00Z"
             }
         }
+    )
 
 class ChatSession(BaseModel):
     """Model for chat sessions"""
@@ -62,8 +96,9 @@ class ChatSession(BaseModel):
     updated_at: datetime = Field(..., description="Session last update timestamp")
     message_count: int = Field(0, description="Number of messages in this session")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="ignore",
+        json_schema_extra={
             "example": {
                 "id": "123e4567-e89b-12d3-a456-426614174000",
                 "user_id": "user-123",
@@ -73,24 +108,33 @@ class ChatSession(BaseModel):
                 "message_count": 5
             }
         }
+    )
+
+class ChatSessionPreview(ChatSession):
+    """Model for chat sessions listed with their latest message"""
+    last_user_message: Optional[str] = Field(None, description="User message of the latest turn (None if the session is empty)")
+    last_ai_response: Optional[str] = Field(None, description="AI response of the latest turn (None if the session is empty)")
 
 class CreateSessionRequest(BaseModel):
     """Request model for creating a new chat session"""
     title: Optional[str] = Field("New Chat", description="Title for the new chat session")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="forbid",
+        json_schema_extra={
             "example": {
                 "title": "Beginner Workout Plan"
             }
         }
+    )
 
 class CreateSessionResponse(BaseModel):
     """Response model for creating a new chat session"""
     session: ChatSession = Field(..., description="The newly created chat session")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="ignore",
+        json_schema_extra={
             "example": {
                 "session": {
                     "id": "123e4567-e89b-12d3-a456-426614174000",
@@ -102,16 +146,19 @@ class CreateSessionResponse(BaseModel):
                 }
             }
         }
+    )
 
 class ErrorResponse(BaseModel):
     """Standard error response model"""
     error: str = Field(..., description="Error message")
     detail: Optional[str] = Field(None, description="Additional error details")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="ignore",
+        json_schema_extra={
             "example": {
                 "error": "Session not found",
                 "detail": "The specified chat session does not exist or does not belong to the current user"
             }
-        } 
\ No newline at end of file
+        }
+    )
\ No newline at end of file
@@ -1,19 +1,275 @@
-from fastapi import APIRouter, HTTPException, Header, Depends, Query
-from typing import Optional, List
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Header, Depends, Query
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
+from cachetools import TLRUCache
+from jose import JWTError
+import asyncio
+import hashlib
+import json
 import logging
+import time
+import uuid
 
 from app.models.chat import (
-    ChatRequest, ChatResponse, ChatHistory, ChatSession,
-    CreateSessionRequest, CreateSessionResponse, ErrorResponse
+    ChatRequest, ChatResponse, ChatHistory, ChatSession, ChatSessionPreview,
+    CreateSessionRequest, CreateSessionResponse, ErrorResponse,
+    ConversationContext, KeysetCursor, make_session_title, parse_cursor, utc_now
 )
 from app.services.openai_service import openai_service
-from app.services.supabase_service import supabase_service
+from app.services.supabase_service import get_supabase_service
+from app.services.cache_service import context_cache
 
 # Get logger (configured in main.py)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Prebuilt validators for list responses, so rows are validated in one pass
+_history_adapter = TypeAdapter(List[ChatHistory])
+_sessions_adapter = TypeAdapter(List[ChatSession])
+_session_previews_adapter = TypeAdapter(List[ChatSessionPreview])
+
+# Response header carrying the keyset cursor for the next page of a list endpoint
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _list_response(
+    adapter: TypeAdapter,
+    rows: List[Dict[str, Any]],
+    limit: int,
+    cursor_field: str,
+    etag: Optional[str] = None,
+    backwards: bool = False
+) -> ORJSONResponse:
+    """
+    Validate rows and encode them straight to JSON, skipping FastAPI's second serialization pass
+    
+    A full page also gets a next-page cursor (the last row's cursor_field, or the
+    first row's when paging backwards) in the X-Next-Cursor header, keeping the body
+    a plain list for existing clients. A comma-separated cursor_field gives a
+    compound cursor of those fields' values.
+    """
+    response = ORJSONResponse(adapter.dump_python(adapter.validate_python(rows), mode="json"))
+    if rows and len(rows) >= limit:
+        row = rows[0 if backwards else -1]
+        response.headers[NEXT_CURSOR_HEADER] = ",".join(str(row[field]) for field in cursor_field.split(","))
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def _cursor_params(cursor: Optional[str], before: Optional[str] = None) -> Tuple[Optional[KeysetCursor], Optional[KeysetCursor]]:
+    """
+    Parse the cursor and before query parameters of a list endpoint
+    
+    Raises:
+        HTTPException: If a cursor is malformed, or both are given
+    """
+    if cursor and before:
+        raise HTTPException(status_code=400, detail="Use either cursor or before, not both")
+    try:
+        return (
+            parse_cursor(cursor) if cursor else None,
+            parse_cursor(before) if before else None
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _make_etag(*parts: Any) -> str:
+    """Build a weak ETag from the values that determine a response"""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+def _not_modified(if_none_match: Optional[str], etag: Optional[str]) -> Optional[Response]:
+    """Return a 304 response if the client's If-None-Match already has this ETag"""
+    if not if_none_match or not etag:
+        return None
+    if if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return None
+
+# Validated users keyed by token digest, so repeat requests skip the Supabase lookup
+# Entries are (user_info, token expiry) and live until the token expires, at most TOKEN_CACHE_SECONDS
+TOKEN_CACHE_SECONDS = 30
+
+def _token_ttu(_key: bytes, value: Tuple[Dict[str, Any], float], now: float) -> float:
+    """Expiry time for a cached token: its exp claim or TOKEN_CACHE_SECONDS from now, whichever is sooner"""
+    return min(now + TOKEN_CACHE_SECONDS, value[1])
+
+_token_cache: TLRUCache = TLRUCache(maxsize=50_000, ttu=_token_ttu, timer=time.time)
+# In-flight validations, so concurrent first requests with the same token share one lookup
+_token_locks: Dict[bytes, asyncio.Lock] = {}
+
+async def _get_context(
+    user_id: str,
+    session_id: Optional[str],
+    message_count: Optional[int] = None
+) -> ConversationContext:
+    """
+    Load recent conversation context from the database and keep the context cache filled
+    
+    Args:
+        user_id: Current authenticated user's ID
+        session_id: The chat session ID (None for the user's recent messages across sessions)
+        message_count: The session's message_count, so a cached copy is only reused while current
+    """
+    context_messages = await get_supabase_service().get_recent_context(
+        user_id=user_id,
+        session_id=session_id,
+        limit=context_cache.MAX_TURNS,
+        message_count=message_count
+    )
+    
+    if session_id:
+        await context_cache.set_context(user_id, session_id, context_messages)
+    
+    return context_messages
+
+async def _prepare_turn(request: ChatRequest, user_id: str) -> Tuple[Optional[Dict[str, Any]], ConversationContext]:
+    """
+    Validate the requested session and load conversation context for a chat turn
+    
+    Args:
+        request: Chat request containing message and optional session_id
+        user_id: Current authenticated user's ID
+        
+    Returns:
+        Tuple of (session row or None for new sessions, context messages)
+        
+    Raises:
+        HTTPException: If the session does not exist or belong to the user
+    """
+    if not request.session_id:
+        session = None
+        context_messages = await _get_context(user_id, None)
+    else:
+        # Validate the session and check the shared context cache in parallel
+        session, context_messages = await asyncio.gather(
+            get_supabase_service().get_session_by_id(request.session_id, user_id),
+            context_cache.get_context(user_id, request.session_id)
+        )
+        
+        if not session:
+            raise HTTPException(
+                status_code=404,
+                detail="Session not found or does not belong to current user"
+            )
+        
+        # On a cache miss, the session's message count tells whether a copy
+        # cached by this worker is still current
+        if context_messages is None:
+            context_messages = await _get_context(user_id, request.session_id, session.get("message_count"))
+    
+    logger.info("Retrieved %d context messages", len(context_messages[0]))
+    
+    return session, context_messages
+
+def _plan_turn(request: ChatRequest, session: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Decide a chat turn's session id, title update and timestamp without touching the database
+    
+    Args:
+        request: Chat request containing message and optional session_id
+        session: Session row from _prepare_turn (None for new sessions)
+        
+    Returns:
+        Dictionary with session_id, session_title (if updated) and timestamp
+    """
+    # New sessions get their id here so the response doesn't wait on the insert
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    # Auto-update session title if it's still "New Chat" and this is the first message
+    # (new sessions are already titled from the message when they are created)
+    updated_title = None
+    if session and session.get("title") == "New Chat" and not session.get("message_count"):
+        # Create a title from the user's message (first 50 characters)
+        updated_title = make_session_title(request.message)
+    
+    return {
+        "session_id": session_id,
+        "session_title": updated_title,
+        "timestamp": utc_now()
+    }
+
+async def _persist_turn(
+    user_id: str,
+    request: ChatRequest,
+    ai_response: str,
+    turn: Dict[str, Any],
+    session: Optional[Dict[str, Any]]
+) -> None:
+    """
+    Store a completed chat turn and apply its session side effects
+    
+    Runs as a background task after the response has been sent.
+    
+    Args:
+        user_id: Current authenticated user's ID
+        request: The chat request that was answered
+        ai_response: The AI's full response text
+        turn: Turn details from _plan_turn
+        session: Session row from _prepare_turn (None for new sessions)
+    """
+    # Plain follow-up messages are written with the next batch
+    queued = bool(request.session_id) and not turn["session_title"]
+    
+    try:
+        if queued:
+            stored_message = await get_supabase_service().queue_chat_message(
+                user_id=user_id,
+                session_id=request.session_id,
+                user_message=request.message,
+                ai_response=ai_response,
+                created_at=turn["timestamp"]
+            )
+            session_created = False
+            logger.debug("Queued message for session: %s", request.session_id)
+        elif request.session_id:
+            # Insert and first-message title update happen in one database call
+            stored_message = await get_supabase_service().log_chat_message_with_title(
+                user_id=user_id,
+                session_id=request.session_id,
+                user_message=request.message,
+                ai_response=ai_response,
+                title=turn["session_title"],
+                created_at=turn["timestamp"]
+            )
+            session_created = False
+            
+            if stored_message.get("session_title"):
+                logger.info("Updated session %s title to: %s", request.session_id, stored_message["session_title"])
+        else:
+            stored_message = await get_supabase_service().log_chat_message(
+                user_id=user_id,
+                user_message=request.message,
+                ai_response=ai_response,
+                session_id=turn["session_id"],
+                create_session=True,
+                created_at=turn["timestamp"]
+            )
+            session_created = stored_message.get("session_created", False)
+        
+        final_session_id = stored_message.get("session_id")
+        
+        # Keep the cached context in step with what was just stored
+        if final_session_id:
+            await context_cache.append_turn(
+                user_id=user_id,
+                session_id=final_session_id,
+                user_message=request.message,
+                ai_response=ai_response,
+                # An empty context may just be a failed read, so only seed
+                # sessions known to have had no messages
+                seed=session_created or (session is not None and session.get("message_count") == 0)
+            )
+        
+        if not queued:
+            logger.info("Stored message in session: %s", final_session_id)
+        
+    except Exception as e:
+        logger.error("Error storing chat turn: %s", e)
+
 async def get_current_user(authorization: Optional[str] = Header(None)):
     """
     Extract user information from authorization header
@@ -33,12 +289,41 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
             detail="Authorization header required"
         )
     
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=401,
+            detail="Authorization header must use the Bearer scheme"
+        )
+    
     try:
         # Extract token from "Bearer <token>" format
-        token = authorization.replace("Bearer ", "")
-        
-        # Validate token and get user info
-        user_info = supabase_service.validate_user_token(token)
+        token = authorization[7:]
+        
+        # Serve from cache when this token was validated recently
+        token_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        cached = _token_cache.get(token_key)
+        user_info = cached[0] if cached else None
+        
+        if user_info is None:
+            lock = _token_locks.setdefault(token_key, asyncio.Lock())
+            try:
+                async with lock:
+                    cached = _token_cache.get(token_key)
+                    user_info = cached[0] if cached else None
+                    if user_info is None:
+                        # Verify locally when possible, otherwise ask Supabase
+                        try:
+                            user_info = get_supabase_service().validate_user_token_local(token)
+                        except JWTError as e:
+                            # Checked locally and rejected, so Supabase would reject it too
+                            logger.debug("Rejected token: %s", e)
+                            raise HTTPException(status_code=401, detail="Invalid or expired token")
+                        if user_info is None:
+                            user_info = await run_in_threadpool(get_supabase_service().validate_user_token, token)
+                        if user_info:
+                            _token_cache[token_key] = (user_info, get_supabase_service().get_token_expiry(token))
+            finally:
+                _token_locks.pop(token_key, None)
         
         if not user_info:
             raise HTTPException(
@@ -48,8 +333,10 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
         
         return user_info
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Authentication error: {str(e)}")
+        logger.error("Authentication error: %s", e)
         raise HTTPException(
             status_code=401,
             detail="Authentication failed"
@@ -58,6 +345,7 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
 @router.post("/", response_model=ChatResponse)
 async def send_chat_message(
     request: ChatRequest,
+    background: BackgroundTasks,
     user: dict = Depends(get_current_user)
 ):
     """
@@ -65,36 +353,20 @@ async def send_chat_message(
     
     Args:
         request: Chat request containing message and optional session_id
+        background: Background tasks used to store the turn after responding
         user: Current authenticated user (from dependency)
         
     Returns:
         AI response with session information
     """
     try:
-        logger.info(f"Processing chat message for user {user['id']}")
-        logger.info(f"Message: {request.message[:100]}...")
-        logger.info(f"Session ID: {request.session_id}")
+        logger.info("Processing chat message for user %s", user["id"])
+        # Only slice the message when the record will actually be emitted
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Message: %s...", request.message[:100])
+        logger.info("Session ID: %s", request.session_id)
         
-        # Validate session if provided
-        if request.session_id:
-            session = await supabase_service.get_session_by_id(
-                request.session_id, 
-                user["id"]
-            )
-            if not session:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Session not found or does not belong to current user"
-                )
-        
-        # Get recent conversation context for this session
-        context_messages = await supabase_service.get_recent_context(
-            user_id=user["id"],
-            session_id=request.session_id,
-            limit=5
-        )
-        
-        logger.info(f"Retrieved {len(context_messages)} context messages")
+        session, context_messages = await _prepare_turn(request, user["id"])
         
         # Get AI response
         ai_response = await openai_service.get_chat_response(
@@ -102,57 +374,107 @@ async def send_chat_message(
             conversation_history=context_messages
         )
         
-        logger.info(f"Received AI response: {ai_response[:100]}...")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Received AI response: %s...", ai_response[:100])
         
-        # Store the conversation in database
-        stored_message = await supabase_service.log_chat_message(
+        # Respond now and store the conversation once the response is sent
+        turn = _plan_turn(request, session)
+        background.add_task(
+            _persist_turn,
             user_id=user["id"],
-            user_message=request.message,
+            request=request,
             ai_response=ai_response,
-            session_id=request.session_id
+            turn=turn,
+            session=session
         )
         
-        # Get the session_id from the stored message (in case a new session was created)
-        final_session_id = stored_message.get("session_id", request.session_id)
-        
-        # Auto-update session title if it's still "New Chat" and this is the first message
-        updated_title = None
-        if final_session_id:
-            current_session = await supabase_service.get_session_by_id(final_session_id, user["id"])
-            if current_session and current_session.get("title") == "New Chat" and current_session.get("message_count") == 1:
-                # Create a title from the user's message (first 50 characters)
-                new_title = request.message[:50].strip()
-                if len(request.message) > 50:
-                    new_title += "..."
-                
-                # Update the session title
-                await supabase_service.update_session_title(
-                    session_id=final_session_id,
-                    user_id=user["id"],
-                    new_title=new_title
-                )
-                updated_title = new_title
-                logger.info(f"Updated session {final_session_id} title to: {new_title}")
-        
-        logger.info(f"Stored message in session: {final_session_id}")
-        
         return ChatResponse(
             message=ai_response,
-            timestamp=stored_message["created_at"],
-            session_id=final_session_id,
-            session_title=updated_title
+            timestamp=turn["timestamp"],
+            session_id=turn["session_id"],
+            session_title=turn["session_title"]
         )
         
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Error processing chat message: {str(e)}")
+        logger.error("Error processing chat message: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to process chat message"
         )
 
+@router.post("/stream")
+async def stream_chat_message(
+    request: ChatRequest,
+    background: BackgroundTasks,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Send a message to the AI fitness coach and stream the reply as Server-Sent Events
+    
+    Each event is a JSON object: {"delta": "..."} for response text, then a final
+    {"done": true, "session_id": ..., "session_title": ..., "timestamp": ...},
+    or {"error": "..."} if generation fails. The turn is stored after the stream ends.
+    
+    Args:
+        request: Chat request containing message and optional session_id
+        background: Background tasks used to store the turn after streaming
+        user: Current authenticated user (from dependency)
+        
+    Returns:
+        Streaming text/event-stream response
+    """
+    logger.info("Streaming chat message for user %s", user["id"])
+    logger.info("Session ID: %s", request.session_id)
+    
+    # Validate before streaming so a bad session is still a plain 404
+    session, context_messages = await _prepare_turn(request, user["id"])
+    
+    turn = _plan_turn(request, session)
+    # Filled in by the stream; read by the background task once the response is sent
+    completed: Dict[str, str] = {}
+    
+    async def event_stream() -> AsyncIterator[str]:
+        chunks: List[str] = []
+        try:
+            async for delta in openai_service.stream_fitness_response(
+                user_message=request.message,
+                conversation_history=context_messages
+            ):
+                chunks.append(delta)
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+            
+            ai_response = "".join(chunks).strip()
+            if not ai_response:
+                raise ValueError("Empty response from OpenAI")
+            
+            completed["ai_response"] = ai_response
+            yield f"data: {json.dumps({'done': True, **turn})}\n\n"
+            
+        except Exception as e:
+            logger.error("Error streaming chat message: %s", e)
+            yield f"data: {json.dumps({'error': 'Failed to process chat message'})}\n\n"
+    
+    async def store_completed_turn() -> None:
+        if "ai_response" in completed:
+            await _persist_turn(
+                user_id=user["id"],
+                request=request,
+                ai_response=completed["ai_response"],
+                turn=turn,
+                session=session
+            )
+    
+    background.add_task(store_completed_turn)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/sessions", response_model=CreateSessionResponse)
 async def create_chat_session(
     request: CreateSessionRequest,
@@ -169,14 +491,14 @@ async def create_chat_session(
         The newly created session
     """
     try:
-        logger.info(f"Creating new chat session for user {user['id']} with title: {request.title}")
+        logger.info("Creating new chat session for user %s with title: %s", user["id"], request.title)
         
-        session = await supabase_service.create_chat_session(
+        session = await get_supabase_service().create_chat_session(
             user_id=user["id"],
             title=request.title or "New Chat"
         )
         
-        logger.info(f"Created session: {session['id']}")
+        logger.info("Created session: %s", session["id"])
         
         return CreateSessionResponse(
             session=ChatSession(
@@ -190,16 +512,19 @@ async def create_chat_session(
         )
         
     except Exception as e:
-        logger.error(f"Error creating chat session: {str(e)}")
+        logger.error("Error creating chat session: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to create chat session"
         )
 
-@router.get("/sessions", response_model=List[ChatSession])
+@router.get("/sessions", response_model=List[ChatSessionPreview])
 async def get_user_sessions(
     user: dict = Depends(get_current_user),
-    limit: int = Query(50, ge=1, le=100, description="Maximum number of sessions to retrieve")
+    limit: int = Query(50, ge=1, le=100, description="Maximum number of sessions to retrieve"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    preview: bool = Query(False, description="Include each session's latest message"),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Get all chat sessions for the authenticated user
@@ -207,34 +532,47 @@ async def get_user_sessions(
     Args:
         user: Current authenticated user (from dependency)
         limit: Maximum number of sessions to retrieve
+        cursor: Cursor from the previous page's X-Next-Cursor header (optional)
+        preview: Add last_user_message and last_ai_response to each session, read in
+            the same query (optional)
+        if_none_match: ETag from a previous response; answered with 304 if unchanged
         
     Returns:
         List of user's chat sessions
     """
+    keyset, _ = _cursor_params(cursor)
+    
     try:
-        logger.info(f"Getting sessions for user {user['id']}, limit: {limit}")
-        
-        sessions = await supabase_service.get_user_sessions(
-            user_id=user["id"],
-            limit=limit
-        )
+        logger.info("Getting sessions for user %s, limit: %s", user["id"], limit)
+        
+        # Check the cheap change marker before fetching and serializing the list. A new
+        # message always bumps its session's updated_at, so it covers previews too
+        version = await get_supabase_service().get_sessions_version(user["id"])
+        etag = _make_etag("sessions", user["id"], version, limit, cursor, preview) if version else None
+        not_modified = _not_modified(if_none_match, etag)
+        if not_modified:
+            return not_modified
+        
+        if preview:
+            sessions = await get_supabase_service().get_sessions_with_last_message(
+                user_id=user["id"],
+                limit=limit,
+                cursor=keyset
+            )
+        else:
+            sessions = await get_supabase_service().get_user_sessions(
+                user_id=user["id"],
+                limit=limit,
+                cursor=keyset
+            )
         
-        logger.info(f"Retrieved {len(sessions)} sessions")
+        logger.info("Retrieved %d sessions", len(sessions))
         
-        return [
-            ChatSession(
-                id=session["id"],
-                user_id=session["user_id"],
-                title=session["title"],
-                created_at=session["created_at"],
-                updated_at=session["updated_at"],
-                message_count=session["message_count"]
-            )
-            for session in sessions
-        ]
+        adapter = _session_previews_adapter if preview else _sessions_adapter
+        return _list_response(adapter, sessions, limit, "updated_at,id", etag)
         
     except Exception as e:
-        logger.error(f"Error retrieving user sessions: {str(e)}")
+        logger.error("Error retrieving user sessions: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to retrieve chat sessions"
@@ -244,7 +582,10 @@ async def get_user_sessions(
 async def get_session_history(
     session_id: str,
     user: dict = Depends(get_current_user),
-    limit: int = Query(50, ge=1, le=100, description="Maximum number of messages to retrieve")
+    limit: int = Query(50, ge=1, le=100, description="Maximum number of messages to retrieve"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    before: Optional[str] = Query(None, description="Only messages older than this cursor (X-Next-Cursor of the previous older page)"),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Get chat history for a specific session
@@ -253,47 +594,50 @@ async def get_session_history(
         session_id: The session ID to get history for
         user: Current authenticated user (from dependency)
         limit: Maximum number of messages to retrieve
+        cursor: Cursor from the previous page's X-Next-Cursor header (optional)
+        before: Return the newest messages older than this cursor, for loading older pages (optional)
+        if_none_match: ETag from a previous response; answered with 304 if unchanged
         
     Returns:
         List of chat messages for the session
     """
+    keyset, before_keyset = _cursor_params(cursor, before)
+    
     try:
-        logger.info(f"Getting history for session {session_id}, limit: {limit}")
+        logger.info("Getting history for session %s, limit: %s", session_id, limit)
         
         # Verify session belongs to user
-        session = await supabase_service.get_session_by_id(session_id, user["id"])
+        session = await get_supabase_service().get_session_by_id(session_id, user["id"])
         if not session:
             raise HTTPException(
                 status_code=404,
                 detail="Session not found or does not belong to current user"
             )
         
+        # The session row changes whenever its messages do, so it doubles as the ETag source
+        etag = _make_etag("history", session_id, session.get("updated_at"), session.get("message_count"), limit, cursor, before)
+        not_modified = _not_modified(if_none_match, etag)
+        if not_modified:
+            return not_modified
+        
         # Get chat history for this session
-        history = await supabase_service.get_chat_history(
+        history = await get_supabase_service().get_chat_history(
             user_id=user["id"],
             session_id=session_id,
-            limit=limit
+            limit=limit,
+            cursor=keyset,
+            before=before_keyset
         )
         
-        logger.info(f"Retrieved {len(history)} messages for session")
+        logger.info("Retrieved %d messages for session", len(history))
         
-        return [
-            ChatHistory(
-                id=msg["id"],
-                user_id=msg["user_id"],
-                session_id=msg["session_id"],
-                user_message=msg["user_message"],
-                ai_response=msg["ai_response"],
-                created_at=msg["created_at"]
-            )
-            for msg in history
-        ]
+        return _list_response(_history_adapter, history, limit, "created_at,id", etag, backwards=before_keyset is not None)
         
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Error retrieving session history: {str(e)}")
+        logger.error("Error retrieving session history: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to retrieve session history"
@@ -315,9 +659,10 @@ async def delete_chat_session(
         Success message
     """
     try:
-        logger.info(f"Deleting session {session_id} for user {user['id']}")
+        logger.info("Deleting session %s for user %s", session_id, user["id"])
         
-        success = await supabase_service.delete_session(session_id, user["id"])
+        success = await get_supabase_service().delete_session(session_id, user["id"])
+        await context_cache.invalidate(user["id"], session_id)
         
         if not success:
             raise HTTPException(
@@ -325,7 +670,7 @@ async def delete_chat_session(
                 detail="Session not found or does not belong to current user"
             )
         
-        logger.info(f"Successfully deleted session {session_id}")
+        logger.info("Successfully deleted session %s", session_id)
         
         return {"message": "Session deleted successfully"}
         
@@ -333,7 +678,7 @@ async def delete_chat_session(
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Error deleting session: {str(e)}")
+        logger.error("Error deleting session: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to delete session"
@@ -353,11 +698,11 @@ async def delete_all_chat_sessions(
         Success message with count of deleted sessions
     """
     try:
-        logger.info(f"Deleting all sessions for user {user['id']}")
+        logger.info("Deleting all sessions for user %s", user["id"])
         
-        deleted_count = await supabase_service.delete_all_user_sessions(user["id"])
+        deleted_count = await get_supabase_service().delete_all_user_sessions(user["id"])
         
-        logger.info(f"Successfully deleted {deleted_count} sessions for user {user['id']}")
+        logger.info("Successfully deleted %s sessions for user %s", deleted_count, user["id"])
         
         return {
             "message": f"Successfully deleted {deleted_count} chat sessions",
@@ -365,7 +710,7 @@ async def delete_all_chat_sessions(
         }
         
     except Exception as e:
-        logger.error(f"Error deleting all sessions: {str(e)}")
+        logger.error("Error deleting all sessions: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to delete all sessions"
@@ -375,6 +720,9 @@ async def delete_all_chat_sessions(
 async def get_chat_history(
     limit: int = Query(10, ge=1, le=100, description="Maximum number of messages to retrieve"),
     session_id: Optional[str] = Query(None, description="Specific session ID (optional)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    before: Optional[str] = Query(None, description="Only messages older than this cursor (X-Next-Cursor of the previous older page)"),
+    if_none_match: Optional[str] = Header(None),
     user: dict = Depends(get_current_user)
 ):
     """
@@ -383,53 +731,55 @@ async def get_chat_history(
     Args:
         limit: Maximum number of messages to retrieve (default: 10)
         session_id: Specific session ID (optional)
+        cursor: Cursor from the previous page's X-Next-Cursor header (optional)
+        before: Return the newest messages older than this cursor, for loading older pages (optional)
+        if_none_match: ETag from a previous response; answered with 304 if unchanged
         user: Current authenticated user (from dependency)
         
     Returns:
         List of chat history messages
     """
+    keyset, before_keyset = _cursor_params(cursor, before)
+    
     try:
-        logger.info(f"Getting chat history for user {user['id']}, session: {session_id}, limit: {limit}")
+        logger.info("Getting chat history for user %s, session: %s, limit: %s", user["id"], session_id, limit)
         
         # Validate session if provided
         if session_id:
-            session = await supabase_service.get_session_by_id(session_id, user["id"])
+            session = await get_supabase_service().get_session_by_id(session_id, user["id"])
             if not session:
                 raise HTTPException(
                     status_code=404,
                     detail="Session not found or does not belong to current user"
                 )
+            version = (session.get("updated_at"), session.get("message_count"))
+        else:
+            version = await get_supabase_service().get_sessions_version(user["id"])
+        
+        etag = _make_etag("history", user["id"], session_id, version, limit, cursor, before) if version else None
+        not_modified = _not_modified(if_none_match, etag)
+        if not_modified:
+            return not_modified
         
         # Get chat history from database
-        history = await supabase_service.get_chat_history(
+        history = await get_supabase_service().get_chat_history(
             user_id=user["id"],
             session_id=session_id,
-            limit=limit
+            limit=limit,
+            cursor=keyset,
+            before=before_keyset
         )
         
-        logger.info(f"Retrieved {len(history)} messages from database")
-        
-        # Convert to ChatHistory models
-        chat_history = [
-            ChatHistory(
-                id=msg["id"],
-                user_id=msg["user_id"],
-                session_id=msg["session_id"],
-                user_message=msg["user_message"],
-                ai_response=msg["ai_response"],
-                created_at=msg["created_at"]
-            )
-            for msg in history
-        ]
+        logger.info("Retrieved %d messages from database", len(history))
         
-        logger.info(f"Returning {len(chat_history)} chat history messages")
-        return chat_history
+        logger.info("Returning %d chat history messages", len(history))
+        return _list_response(_history_adapter, history, limit, "created_at,id", etag, backwards=before_keyset is not None)
         
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Error retrieving chat history: {str(e)}")
+        logger.error("Error retrieving chat history: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to retrieve chat history"
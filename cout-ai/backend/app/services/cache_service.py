@@ -0,0 +1,168 @@
+import redis.asyncio as redis
+import json
+import logging
+from typing import Optional
+from app.config import settings
+from app.models.chat import ConversationContext
+
+logger = logging.getLogger(__name__)
+
+class ContextCacheService:
+    """Service for caching recent conversation context in Redis"""
+
+    # Number of (user_message, ai_response) pairs kept per session
+    MAX_TURNS: int = 5
+    # Idle sessions fall out of the cache after this many seconds
+    TTL_SECONDS: int = 3600
+
+    def __init__(self):
+        """Create the service; the Redis connection is opened in connect()"""
+        self.redis = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether a Redis connection is available"""
+        return self.redis is not None
+
+    async def connect(self) -> None:
+        """Connect to Redis if REDIS_URL is configured (caching is skipped otherwise)"""
+        if not settings.REDIS_URL:
+            logger.info("REDIS_URL not set - conversation context caching disabled")
+            return
+
+        try:
+            client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+            await client.ping()
+            self.redis = client
+            logger.info("Connected to Redis for conversation context caching")
+
+        except Exception as e:
+            logger.warning("Could not connect to Redis, context caching disabled: %s", e)
+            self.redis = None
+
+    async def close(self) -> None:
+        """Close the Redis connection"""
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    @staticmethod
+    def _key(user_id: str, session_id: str) -> str:
+        return f"ctx:{user_id}:{session_id}"
+
+    async def get_context(self, user_id: str, session_id: str) -> Optional[ConversationContext]:
+        """
+        Get cached conversation context for a session
+
+        Args:
+            user_id: The user's ID from Supabase auth
+            session_id: The chat session ID
+
+        Returns:
+            Tuple of (user messages, AI responses) in chronological order, or None on a cache miss
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            key = self._key(user_id, session_id)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.exists(key)
+                pipe.lrange(key, 0, -1)
+                exists, items = await pipe.execute()
+
+            if not exists:
+                return None
+
+            # Stored newest-first
+            turns = [json.loads(item) for item in reversed(items)]
+            return (
+                tuple(turn["user_message"] for turn in turns),
+                tuple(turn["ai_response"] for turn in turns)
+            )
+
+        except Exception as e:
+            logger.warning("Error reading context cache: %s", e)
+            return None
+
+    async def set_context(self, user_id: str, session_id: str, context: ConversationContext) -> None:
+        """
+        Replace the cached context for a session
+
+        Args:
+            user_id: The user's ID from Supabase auth
+            session_id: The chat session ID
+            context: Tuple of (user messages, AI responses) in chronological order
+        """
+        user_messages, ai_responses = context
+        # Redis has no empty lists; empty sessions are seeded by append_turn instead
+        if not self.enabled or not user_messages:
+            return
+
+        try:
+            key = self._key(user_id, session_id)
+            recent = zip(user_messages[-self.MAX_TURNS:], ai_responses[-self.MAX_TURNS:])
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                for user_message, ai_response in recent:
+                    pipe.lpush(key, json.dumps({
+                        "user_message": user_message or "",
+                        "ai_response": ai_response or ""
+                    }))
+                pipe.expire(key, self.TTL_SECONDS)
+                await pipe.execute()
+
+        except Exception as e:
+            logger.warning("Error writing context cache: %s", e)
+
+    async def append_turn(
+        self,
+        user_id: str,
+        session_id: str,
+        user_message: str,
+        ai_response: str,
+        seed: bool = False
+    ) -> None:
+        """
+        Add a completed turn to the cached context for a session
+
+        Sessions are only updated if already cached, so a partial context is
+        never created, unless seed is set because this turn is the whole context.
+
+        Args:
+            user_id: The user's ID from Supabase auth
+            session_id: The chat session ID
+            user_message: The user's message
+            ai_response: The AI's response
+            seed: True if the session had no earlier turns
+        """
+        if not self.enabled:
+            return
+
+        try:
+            key = self._key(user_id, session_id)
+            entry = json.dumps({"user_message": user_message, "ai_response": ai_response})
+            async with self.redis.pipeline(transaction=True) as pipe:
+                if seed:
+                    pipe.lpush(key, entry)
+                else:
+                    pipe.lpushx(key, entry)
+                pipe.ltrim(key, 0, self.MAX_TURNS - 1)
+                pipe.expire(key, self.TTL_SECONDS)
+                await pipe.execute()
+
+        except Exception as e:
+            logger.warning("Error updating context cache: %s", e)
+
+    async def invalidate(self, user_id: str, session_id: str) -> None:
+        """Drop the cached context for a session"""
+        if not self.enabled:
+            return
+
+        try:
+            await self.redis.delete(self._key(user_id, session_id))
+        except Exception as e:
+            logger.warning("Error invalidating context cache: %s", e)
+
+# Create global service instance
+context_cache = ContextCacheService()
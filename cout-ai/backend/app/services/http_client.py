@@ -0,0 +1,9 @@
+import httpx
+
+# Shared outbound HTTP client (OpenAI, Supabase auth keys) so every service reuses
+# one connection pool, TLS session cache and DNS lookups. Closed in main.lifespan.
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+    timeout=httpx.Timeout(30.0)
+)
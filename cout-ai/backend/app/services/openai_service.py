@@ -1,6 +1,9 @@
+import httpx
 import openai
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator
 from app.config import settings
+from app.models.chat import ConversationContext, EMPTY_CONTEXT
+from app.services.http_client import http_client
 
 class OpenAIService:
     """Service for handling OpenAI API interactions"""
@@ -10,10 +13,16 @@ class OpenAIService:
         if not settings.OPENAI_API_KEY:
             raise ValueError("OpenAI API key is required")
         
-        openai.api_key = settings.OPENAI_API_KEY
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Async client so completions don't block the event loop; runs on the
+        # shared httpx client so its connection pool is reused across requests
+        self.client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            timeout=httpx.Timeout(30.0),
+            max_retries=2,
+            http_client=http_client
+        )
     
-    async def get_chat_response(self, user_message: str, conversation_history: List[Dict[str, str]] = None) -> str:
+    async def get_chat_response(self, user_message: str, conversation_history: ConversationContext = None) -> str:
         """
         Generate AI fitness coaching response (new interface)
         
@@ -26,7 +35,7 @@ class OpenAIService:
         """
         return await self.generate_fitness_response(user_message, conversation_history)
     
-    async def generate_fitness_response(self, user_message: str, conversation_history: List[Dict[str, str]] = None) -> str:
+    async def generate_fitness_response(self, user_message: str, conversation_history: ConversationContext = None) -> str:
         """
         Generate AI fitness coaching response
         
@@ -38,30 +47,10 @@ class OpenAIService:
             AI generated response string
         """
         try:
-            # Build conversation messages
-            messages = [
-                {"role": "system", "content": settings.SYSTEM_PROMPT}
-            ]
-            
-            # Add conversation history if provided
-            if conversation_history:
-                for msg in conversation_history[-5:]:  # Keep last 5 messages for context
-                    messages.append({"role": "user", "content": msg.get("user_message", "")})
-                    messages.append({"role": "assistant", "content": msg.get("ai_response", "")})
-            
-            # Add current user message
-            messages.append({"role": "user", "content": user_message})
+            messages = self._build_messages(user_message, conversation_history)
             
             # Generate response using OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # Using GPT-4 for better fitness coaching
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.1,  # Balanced creativity and consistency
-                top_p=0.9,
-                frequency_penalty=0.1,
-                presence_penalty=0.1
-            )
+            response = await self._create_completion(messages)
             
             # Extract and return the response content
             ai_response = response.choices[0].message.content
@@ -80,6 +69,70 @@ class OpenAIService:
         except Exception as e:
             raise Exception(f"Failed to generate AI response: {str(e)}")
     
+    async def stream_fitness_response(self, user_message: str, conversation_history: ConversationContext = None) -> AsyncIterator[str]:
+        """
+        Stream AI fitness coaching response as it is generated
+        
+        Args:
+            user_message: The user's message/question
+            conversation_history: Optional previous conversation for context
+            
+        Yields:
+            Chunks of the AI response text, in order
+        """
+        try:
+            messages = self._build_messages(user_message, conversation_history)
+            
+            stream = await self._create_completion(messages, stream=True)
+            
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+            
+        except openai.RateLimitError:
+            raise Exception("OpenAI API rate limit exceeded. Please try again later.")
+        except openai.AuthenticationError:
+            raise Exception("OpenAI API authentication failed. Please check your API key.")
+        except openai.APIError as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Failed to generate AI response: {str(e)}")
+    
+    def _build_messages(self, user_message: str, conversation_history: ConversationContext = None) -> List[Dict[str, str]]:
+        """Build the chat completion messages: system prompt, recent history, then the new message"""
+        # Keep last 5 messages for context
+        user_messages, ai_responses = conversation_history or EMPTY_CONTEXT
+        
+        # System prompt, then a user/assistant pair per history message, then the current message
+        messages = [settings.SYSTEM_MESSAGE]
+        messages.extend(
+            turn
+            for past_message, past_response in zip(user_messages[-5:], ai_responses[-5:])
+            for turn in (
+                {"role": "user", "content": past_message or ""},
+                {"role": "assistant", "content": past_response or ""}
+            )
+        )
+        messages.append({"role": "user", "content": user_message})
+        
+        return messages
+    
+    async def _create_completion(self, messages: List[Dict[str, str]], stream: bool = False):
+        """Call the chat completions API with the service's model settings"""
+        return await self.client.chat.completions.create(
+            model="gpt-3.5-turbo",  # Using GPT-4 for better fitness coaching
+            messages=messages,
+            max_tokens=1000,
+            temperature=0.1,  # Balanced creativity and consistency
+            top_p=0.9,
+            frequency_penalty=0.1,
+            presence_penalty=0.1,
+            stream=stream
+        )
+    
     def validate_message(self, message: str) -> bool:
         """
         Validate user message for safety and appropriateness
@@ -1,8 +1,189 @@
 from supabase import create_client, Client
-from typing import List, Dict, Any, Optional
+from postgrest.types import ReturnMethod
+from starlette.concurrency import run_in_threadpool
+from jose import jwt, JWTError, JOSEError
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from functools import lru_cache
+from cachetools import TTLCache
+from urllib.parse import urlparse
+from uuid import UUID
+import asyncio
+import asyncpg
+import re
+import httpx
+import orjson
 import uuid
+import logging
 from app.config import settings
+from app.models.chat import ConversationContext, EMPTY_CONTEXT, KeysetCursor, make_session_title, utc_now
+from app.services.http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+# Columns returned to clients (the models in app.models.chat) - never SELECT *
+_SESSION_COLS = "id, user_id, title, created_at, updated_at"
+_MSG_COLS = "id, user_id, session_id, user_message, ai_response, created_at"
+
+# Session columns plus the number of messages, counted by PostgREST in the same query
+_SESSION_WITH_COUNT = f"{_SESSION_COLS}, chat_messages(count)"
+
+def _with_message_count(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace the embedded chat_messages count with a flat message_count field"""
+    counts = session.pop("chat_messages", None)
+    if counts is not None:
+        session["message_count"] = counts[0]["count"] if counts else 0
+    return session
+
+_MISSING_TABLE_RE = re.compile(r"does not exist|relation", re.I)
+
+def _is_missing_table(error: Exception) -> bool:
+    """Whether a database error means a table hasn't been created yet"""
+    if isinstance(error, asyncpg.UndefinedTableError):
+        return True
+    # Postgres undefined_table, as forwarded by PostgREST
+    if getattr(error, "code", None) == "42P01":
+        return True
+    return bool(_MISSING_TABLE_RE.search(str(error)))
+
+def _is_missing_function(error: Exception) -> bool:
+    """Whether a PostgREST error means a database function hasn't been created yet"""
+    # PostgREST reports an unknown function as PGRST202
+    return "PGRST202" in str(error) or "Could not find the function" in str(error)
+
+def _or_filter(query: Any, conditions: str) -> Any:
+    """Add a PostgREST or=(...) filter; postgrest-py 0.13 has no or_() builder method"""
+    query.params = query.params.add("or", f"({conditions})")
+    return query
+
+def _order_by(query: Any, columns: Tuple[str, ...], desc: bool = False) -> Any:
+    """Order by several columns in one order parameter (repeated .order() calls aren't combined)"""
+    query.params = query.params.add("order", ",".join(f"{column}.desc" if desc else column for column in columns))
+    return query
+
+def _keyset_filter(query: Any, column: str, cursor: KeysetCursor, operator: str) -> Any:
+    """
+    Continue after a (column, id) keyset cursor
+    
+    operator is "gt" for pages in ascending order and "lt" for descending ones.
+    Rows tied on the cursor's timestamp are split by id, so none are skipped.
+    """
+    timestamp, row_id = cursor[0].isoformat(), cursor[1]
+    if row_id is None:
+        return query.filter(column, operator, timestamp)
+    return _or_filter(
+        query,
+        f'{column}.{operator}."{timestamp}",and({column}.eq."{timestamp}",id.{operator}.{row_id})'
+    )
+
+# Asymmetric algorithms Supabase signs with, verified against the project's JWKS
+_JWKS_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512"}
+
+# Hot-path queries run directly against Postgres when DATABASE_URL is set.
+# asyncpg prepares each one once per connection and reuses the plan afterwards.
+_SQL_SESSION_BY_ID = """
+    SELECT s.id, s.user_id, s.title, s.created_at, s.updated_at,
+        (SELECT count(*) FROM chat_messages m WHERE m.session_id = s.id) AS message_count
+    FROM chat_sessions s
+    WHERE s.id = $1 AND s.user_id = $2
+"""
+_SQL_RECENT_CONTEXT = """
+    SELECT user_message, ai_response FROM chat_messages
+    WHERE user_id = $1 AND session_id = $2
+    ORDER BY created_at DESC
+    LIMIT $3
+"""
+_SQL_RECENT_CONTEXT_ALL = """
+    SELECT user_message, ai_response FROM chat_messages
+    WHERE user_id = $1
+    ORDER BY created_at DESC
+    LIMIT $2
+"""
+_SQL_SESSIONS_WITH_LAST_MESSAGE = """
+    SELECT s.id, s.user_id, s.title, s.created_at, s.updated_at,
+        (SELECT count(*) FROM chat_messages c WHERE c.session_id = s.id) AS message_count,
+        m.user_message AS last_user_message, m.ai_response AS last_ai_response
+    FROM chat_sessions s
+    LEFT JOIN LATERAL (
+        SELECT user_message, ai_response FROM chat_messages
+        -- user_id lets this use idx_chat_messages_user_session_created
+        WHERE user_id = s.user_id AND session_id = s.id
+        ORDER BY created_at DESC
+        LIMIT 1
+    ) m ON true
+    WHERE s.user_id = $1
+        -- Keyset cursor: after ($3, $4), or before $3 alone when $4 is NULL
+        AND ($3::timestamptz IS NULL OR s.updated_at < $3
+            OR (s.updated_at = $3 AND s.id < $4::uuid))
+    ORDER BY s.updated_at DESC, s.id DESC
+    LIMIT $2
+"""
+# Session and first message in one statement; needs no database function
+_SQL_INSERT_MESSAGE_AUTOSESSION = """
+    WITH s AS (
+        INSERT INTO chat_sessions (id, user_id, title)
+        VALUES (COALESCE($1::uuid, gen_random_uuid()), $2, $3)
+        RETURNING id
+    )
+    INSERT INTO chat_messages (user_id, session_id, user_message, ai_response, created_at)
+    SELECT $2, s.id, $4, $5, COALESCE($6::timestamptz, NOW()) FROM s
+    RETURNING id, user_id, session_id, user_message, ai_response, created_at
+"""
+_SQL_DELETE_USER_SESSIONS = """
+    DELETE FROM chat_sessions WHERE user_id = $1 RETURNING id
+"""
+
+# Queued messages are written together once this many are waiting or the window closes
+MESSAGE_BATCH_SIZE = 500
+MESSAGE_BATCH_WINDOW = 0.025
+
+async def _drain_batch(queue: asyncio.Queue, max_items: int, timeout: float) -> List[Any]:
+    """Wait for one item, then collect more until max_items or timeout seconds have passed"""
+    batch = [await queue.get()]
+    deadline = asyncio.get_running_loop().time() + timeout
+    
+    while len(batch) < max_items:
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    
+    return batch
+
+def _uses_transaction_pooler() -> bool:
+    """Whether DATABASE_URL goes through Supavisor/pgBouncer in transaction mode"""
+    if settings.SUPABASE_POOLER_MODE:
+        return settings.SUPABASE_POOLER_MODE == "transaction"
+    # Supabase serves transaction-mode pooling on port 6543
+    try:
+        return urlparse(settings.DATABASE_URL).port == 6543
+    except ValueError:
+        return False
+
+def _to_context(rows: List[Any]) -> ConversationContext:
+    """Split newest-first (user_message, ai_response) rows into chronological parallel tuples"""
+    rows = rows[::-1]
+    return (
+        tuple(row["user_message"] for row in rows),
+        tuple(row["ai_response"] for row in rows)
+    )
+
+def _decode_json_with_orjson(response: httpx.Response) -> None:
+    """httpx response hook: decode the body with orjson when supabase-py calls response.json()"""
+    response.json = lambda **kwargs: orjson.loads(response.content)
+
+def _record_to_dict(record: asyncpg.Record) -> Dict[str, Any]:
+    """Convert an asyncpg record to the JSON-style dict PostgREST would return"""
+    row = dict(record)
+    for key, value in row.items():
+        if isinstance(value, UUID):
+            row[key] = str(value)
+        elif isinstance(value, datetime):
+            row[key] = value.isoformat()
+    return row
 
 class SupabaseService:
     """Service for handling Supabase database operations"""
@@ -14,24 +195,282 @@ class SupabaseService:
         
         # Use service role key for backend operations to bypass RLS
         if settings.SUPABASE_SERVICE_ROLE_KEY:
-            print("Using Supabase service role key for backend operations")
+            logger.info("Using Supabase service role key for backend operations")
             self.client: Client = create_client(
                 settings.SUPABASE_URL,
                 settings.SUPABASE_SERVICE_ROLE_KEY
             )
         elif settings.SUPABASE_ANON_KEY:
-            print("⚠️  Using anon key - RLS policies may cause issues")
+            logger.warning("⚠️  Using anon key - RLS policies may cause issues")
             self.client: Client = create_client(
                 settings.SUPABASE_URL,
                 settings.SUPABASE_ANON_KEY
             )
         else:
             raise ValueError("Either SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY is required")
+        
+        self._configure_http_pool()
+        
+        # Table handles, created once on the tuned session. PostgREST request
+        # builders are stateless - every select/insert/update/delete returns a new one
+        self._sessions_table = self.client.table("chat_sessions")
+        self._messages_table = self.client.table("chat_messages")
+        
+        # Signing keys for asymmetric (RS256/ES256) access tokens, loaded at startup
+        self.jwks: Optional[Dict[str, Any]] = None
+        
+        # Direct Postgres pool for hot-path reads, opened at startup if DATABASE_URL is set
+        self.db_pool: Optional[asyncpg.Pool] = None
+        
+        # Messages waiting to be batch-inserted, and the task writing them
+        self._msg_queue: Optional[asyncio.Queue] = None
+        self._msg_writer: Optional[asyncio.Task] = None
+        self._batch_rpc_available = True
+        
+        # Recent session context keyed by (user_id, session_id), holding
+        # [limit fetched, context, session message count]. Entries are only served
+        # while the count matches the session row, so turns logged by another
+        # worker are never missed.
+        self._ctx_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+    
+    def _configure_http_pool(self) -> None:
+        """
+        Swap the PostgREST client's default httpx session for a tuned, retrying pool
+        
+        supabase-py doesn't accept a custom HTTP client, so the session is replaced
+        in place, keeping its base URL and auth headers. Responses are decoded
+        with orjson instead of the stdlib json module.
+        """
+        postgrest = self.client.postgrest
+        default_session = postgrest.session
+        
+        postgrest.session = httpx.Client(
+            base_url=default_session.base_url,
+            headers=default_session.headers,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            event_hooks={"response": [_decode_json_with_orjson]},
+            transport=httpx.HTTPTransport(
+                retries=3,
+                limits=httpx.Limits(
+                    max_connections=60,
+                    max_keepalive_connections=40,
+                    keepalive_expiry=60
+                )
+            )
+        )
+        default_session.close()
+    
+    @staticmethod
+    async def _exec(query: Any) -> Any:
+        """
+        Run a supabase-py query builder off the event loop
+        
+        The PostgREST client is synchronous, so .execute() runs on the shared
+        worker thread pool instead of blocking other requests.
+        """
+        return await run_in_threadpool(query.execute)
+    
+    async def warm_up(self) -> None:
+        """Open a pooled connection to Supabase so the first request doesn't pay for the TLS handshake"""
+        try:
+            await self._exec(self._sessions_table.select("id").limit(1))
+            logger.info("Supabase connection pool warmed up")
+        except Exception as e:
+            logger.warning("Could not warm up Supabase connection: %s", e)
+    
+    async def connect_db(self) -> None:
+        """Open the direct Postgres pool (queries go through PostgREST without DATABASE_URL)"""
+        if not settings.DATABASE_URL:
+            return
+        
+        pool_options: Dict[str, Any] = {}
+        if _uses_transaction_pooler():
+            # Transaction-mode poolers hand each transaction a different server
+            # connection, so named prepared statements would go missing
+            pool_options = {
+                "statement_cache_size": 0,
+                "server_settings": {"search_path": "public"}
+            }
+        
+        try:
+            self.db_pool = await asyncpg.create_pool(
+                settings.DATABASE_URL,
+                min_size=2,
+                max_size=10,
+                command_timeout=30,
+                **pool_options
+            )
+            logger.info("Connected to Postgres for direct queries (statement cache %s)", "off" if pool_options else "on")
+            
+        except Exception as e:
+            logger.warning("⚠️  Could not connect to Postgres, using PostgREST only: %s", e)
+            self.db_pool = None
+    
+    async def close_db(self) -> None:
+        """Close the direct Postgres pool"""
+        if self.db_pool is not None:
+            await self.db_pool.close()
+            self.db_pool = None
+    
+    def _invalidate_context(self, user_id: str, session_id: Optional[str] = None) -> None:
+        """Drop cached context for a session (or every session if None) once its messages change"""
+        if session_id is None:
+            for key in [key for key in self._ctx_cache if key[0] == user_id]:
+                self._ctx_cache.pop(key, None)
+            return
+        
+        self._ctx_cache.pop((user_id, session_id), None)
+    
+    def _append_context(
+        self,
+        user_id: str,
+        session_id: Optional[str],
+        user_message: str,
+        ai_response: str
+    ) -> None:
+        """Add a logged turn to the cached context for its session"""
+        entry = self._ctx_cache.get((user_id, session_id)) if session_id else None
+        if entry is None:
+            return
+        
+        limit, (user_messages, ai_responses), message_count = entry
+        # Keep only the latest limit turns, as a fresh fetch would
+        entry[1] = (
+            (user_messages + (user_message,))[-limit:] if limit else (),
+            (ai_responses + (ai_response,))[-limit:] if limit else ()
+        )
+        entry[2] = message_count + 1
+    
+    async def start_message_writer(self) -> None:
+        """Start the background task that batch-inserts queued chat messages"""
+        if self._msg_writer is not None:
+            return
+        
+        self._msg_queue = asyncio.Queue()
+        self._msg_writer = asyncio.create_task(self._write_messages())
+    
+    async def stop_message_writer(self) -> None:
+        """Write any queued chat messages and stop the background writer"""
+        if self._msg_writer is None:
+            return
+        
+        # Later messages are written directly; None tells the writer to flush and exit
+        writer, self._msg_writer = self._msg_writer, None
+        await self._msg_queue.put(None)
+        await writer
+    
+    async def _write_messages(self) -> None:
+        """Insert queued messages in batches until stopped"""
+        while True:
+            batch = await _drain_batch(self._msg_queue, MESSAGE_BATCH_SIZE, MESSAGE_BATCH_WINDOW)
+            messages = [message for message in batch if message is not None]
+            
+            if messages:
+                await self._insert_messages(messages)
+            
+            if len(messages) != len(batch):
+                return
+    
+    async def _insert_messages(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Insert a batch of messages for existing sessions in one call
+        
+        Uses the log_chat_messages database function, which also bumps each
+        session's updated_at; falls back to a plain multi-row insert if the
+        performance migration hasn't been run.
+        """
+        try:
+            written = False
+            if self._batch_rpc_available:
+                try:
+                    await self._exec(self.client.rpc("log_chat_messages", {"p_messages": messages}))
+                    written = True
+                except Exception as e:
+                    if not _is_missing_function(e):
+                        raise e
+                    logger.warning("⚠️  log_chat_messages function doesn't exist. Please run the database migration.")
+                    logger.warning("📋 Check the database-migration-performance.sql file for migration instructions.")
+                    self._batch_rpc_available = False
+            
+            if not written:
+                await self._exec(self._messages_table.insert(messages))
+            
+            for message in messages:
+                self._append_context(
+                    message["user_id"], message["session_id"], message["user_message"], message["ai_response"]
+                )
+            
+            logger.debug("Logged %d queued messages", len(messages))
+            
+        except Exception as e:
+            # Log error but keep the writer running
+            logger.error("Error logging %d queued messages: %s", len(messages), e)
+    
+    async def queue_chat_message(
+        self,
+        user_id: str,
+        session_id: str,
+        user_message: str,
+        ai_response: str,
+        created_at: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Queue a chat message for an existing session to be inserted with the next batch
+        
+        Args:
+            user_id: The user's ID from Supabase auth
+            session_id: The chat session ID
+            user_message: The user's original message
+            ai_response: The AI's response
+            created_at: Message timestamp in ISO format (optional - defaults to now)
+            
+        Returns:
+            Dictionary containing the message data (the id is generated here, so it
+            is final before the message is written)
+        """
+        message_data = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "session_id": session_id,
+            "user_message": user_message,
+            "ai_response": ai_response,
+            # Batched rows need an explicit timestamp to keep their order
+            "created_at": created_at or utc_now()
+        }
+        if self._msg_writer is None:
+            # No writer running: insert now, still through log_chat_messages so the
+            # session's updated_at is bumped (the migration drops the trigger that did)
+            await self._insert_messages([message_data])
+        else:
+            await self._msg_queue.put(message_data)
+        return message_data
+    
+    async def load_jwks(self) -> None:
+        """
+        Fetch the project's JSON Web Key Set so asymmetric tokens can be verified locally
+        
+        Failures are non-fatal; tokens then fall back to remote validation.
+        """
+        try:
+            response = await http_client.get(
+                f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json",
+                timeout=10.0
+            )
+            response.raise_for_status()
+            jwks = response.json()
+            
+            if jwks.get("keys"):
+                self.jwks = jwks
+                logger.info("Loaded %d Supabase signing keys", len(jwks["keys"]))
+                
+        except Exception as e:
+            logger.warning("Could not load Supabase JWKS: %s", e)
     
     async def create_chat_session(
         self, 
         user_id: str, 
-        title: str = "New Chat"
+        title: str = "New Chat",
+        session_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create a new chat session for a user
@@ -39,40 +478,42 @@ class SupabaseService:
         Args:
             user_id: The user's ID from Supabase auth
             title: Title for the new chat session
+            session_id: ID to create the session with (optional - generated if None)
             
         Returns:
             Dictionary containing the created session data
         """
         try:
+            # created_at, updated_at and message_count come from column defaults. The
+            # id is made here: this plain insert is also the path for databases
+            # without the performance migration's gen_random_uuid() defaults
             session_data = {
-                "id": str(uuid.uuid4()),
+                "id": session_id or str(uuid.uuid4()),
                 "user_id": user_id,
-                "title": title,
-                "created_at": datetime.utcnow().isoformat() + "Z",
-                "updated_at": datetime.utcnow().isoformat() + "Z",
-                "message_count": 0
+                "title": title
             }
             
-            result = self.client.table("chat_sessions").insert(session_data).execute()
+            result = await self._exec(self._sessions_table.insert(session_data))
             
             if result.data:
-                print(f"Created new chat session: {result.data[0]}")
+                logger.debug("Created new chat session: %s", result.data[0])
                 return result.data[0]
             else:
                 raise Exception("Failed to create chat session")
                 
         except Exception as e:
-            print(f"Error creating chat session: {str(e)}")
+            logger.error("Error creating chat session: %s", e)
             # If table doesn't exist, provide helpful error message
-            if "does not exist" in str(e) or "relation" in str(e):
-                print("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
-                print("📋 Check the database-migration.sql file for migration instructions.")
+            if _is_missing_table(e):
+                logger.warning("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
+                logger.warning("📋 Check the database-migration.sql file for migration instructions.")
             raise e
     
     async def get_user_sessions(
         self, 
         user_id: str, 
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[KeysetCursor] = None
     ) -> List[Dict[str, Any]]:
         """
         Get all chat sessions for a user
@@ -80,31 +521,131 @@ class SupabaseService:
         Args:
             user_id: The user's ID from Supabase auth
             limit: Maximum number of sessions to retrieve
+            cursor: (updated_at, id) of the last session on the previous page (optional -
+                the id may be None)
             
         Returns:
-            List of chat sessions ordered by last update
+            List of chat sessions ordered by last update, then id
         """
         try:
-            print(f"Getting sessions for user_id: {user_id}, limit: {limit}")
+            logger.debug("Getting sessions for user_id: %s, limit: %s, cursor: %s", user_id, limit, cursor)
+            
+            query = self._sessions_table\
+                .select(_SESSION_WITH_COUNT)\
+                .eq("user_id", user_id)
             
-            result = self.client.table("chat_sessions")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .order("updated_at", desc=True)\
-                .limit(limit)\
-                .execute()
+            # Keyset pagination: continue after the previous page's last row. A batch
+            # of messages bumps several sessions to the same updated_at, so the id
+            # breaks ties and rows on the boundary timestamp aren't skipped.
+            if cursor:
+                query = _keyset_filter(query, "updated_at", cursor, "lt")
             
-            print(f"Found {len(result.data) if result.data else 0} sessions")
-            return result.data if result.data else []
+            result = await self._exec(
+                _order_by(query, ("updated_at", "id"), desc=True)
+                .limit(limit)
+            )
+            
+            logger.debug("Found %d sessions", len(result.data) if result.data else 0)
+            return [_with_message_count(row) for row in result.data] if result.data else []
                 
         except Exception as e:
-            print(f"Error retrieving user sessions: {str(e)}")
+            logger.error("Error retrieving user sessions: %s", e)
             # If table doesn't exist, return empty list
-            if "does not exist" in str(e) or "relation" in str(e):
-                print("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
+            if _is_missing_table(e):
+                logger.warning("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
                 return []
             return []
     
+    async def get_sessions_with_last_message(
+        self,
+        user_id: str,
+        limit: int = 50,
+        cursor: Optional[KeysetCursor] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get a user's chat sessions together with each session's latest message, in one query
+        
+        Args:
+            user_id: The user's ID from Supabase auth
+            limit: Maximum number of sessions to retrieve
+            cursor: (updated_at, id) of the last session on the previous page (optional -
+                the id may be None)
+            
+        Returns:
+            List of chat sessions ordered by last update, then id, each with
+            message_count, last_user_message and last_ai_response (None for
+            sessions without messages)
+        """
+        try:
+            if self.db_pool is not None:
+                updated_at, last_id = cursor if cursor else (None, None)
+                async with self.db_pool.acquire() as con:
+                    records = await con.fetch(
+                        _SQL_SESSIONS_WITH_LAST_MESSAGE, UUID(user_id), limit, updated_at, last_id
+                    )
+                return [_record_to_dict(record) for record in records]
+            
+            query = self._sessions_table\
+                .select(f"{_SESSION_WITH_COUNT}, last_message:chat_messages(user_message, ai_response)")\
+                .eq("user_id", user_id)
+            
+            if cursor:
+                query = _keyset_filter(query, "updated_at", cursor, "lt")
+            
+            # Embed only the newest message of each session
+            result = await self._exec(
+                _order_by(query, ("updated_at", "id"), desc=True)
+                .order("created_at", desc=True, foreign_table="last_message")
+                .limit(1, foreign_table="last_message")
+                .limit(limit)
+            )
+            
+            sessions = []
+            for row in result.data or []:
+                row = _with_message_count(row)
+                last_message = row.pop("last_message", None) or [{}]
+                row["last_user_message"] = last_message[0].get("user_message")
+                row["last_ai_response"] = last_message[0].get("ai_response")
+                sessions.append(row)
+            return sessions
+                
+        except Exception as e:
+            logger.error("Error retrieving sessions with last message: %s", e)
+            if _is_missing_table(e):
+                logger.warning("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
+            return []
+    
+    async def get_sessions_version(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cheap change marker for a user's sessions
+        
+        Any new, renamed, deleted or newly-messaged session changes either the
+        latest updated_at or the count, so this can stand in for the full list.
+        
+        Args:
+            user_id: The user's ID from Supabase auth
+            
+        Returns:
+            Dictionary with latest_update and count, or None if it couldn't be read
+        """
+        try:
+            result = await self._exec(
+                self._sessions_table
+                .select("updated_at", count="exact")
+                .eq("user_id", user_id)
+                .order("updated_at", desc=True)
+                .limit(1)
+            )
+            
+            return {
+                "latest_update": result.data[0]["updated_at"] if result.data else None,
+                "count": result.count if result.count is not None else 0
+            }
+                
+        except Exception as e:
+            logger.error("Error retrieving sessions version: %s", e)
+            return None
+    
     async def get_session_by_id(
         self, 
         session_id: str, 
@@ -121,20 +662,26 @@ class SupabaseService:
             Session data if found and belongs to user, None otherwise
         """
         try:
-            result = self.client.table("chat_sessions")\
-                .select("*")\
-                .eq("id", session_id)\
-                .eq("user_id", user_id)\
-                .single()\
-                .execute()
-            
-            return result.data if result.data else None
+            if self.db_pool is not None:
+                async with self.db_pool.acquire() as con:
+                    record = await con.fetchrow(_SQL_SESSION_BY_ID, UUID(session_id), UUID(user_id))
+                return _record_to_dict(record) if record else None
+            
+            result = await self._exec(
+                self._sessions_table
+                .select(_SESSION_WITH_COUNT)
+                .eq("id", session_id)
+                .eq("user_id", user_id)
+                .single()
+            )
+            
+            return _with_message_count(result.data) if result.data else None
                 
         except Exception as e:
-            print(f"Error retrieving session {session_id}: {str(e)}")
+            logger.error("Error retrieving session %s: %s", session_id, e)
             # If table doesn't exist, return None
-            if "does not exist" in str(e) or "relation" in str(e):
-                print("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
+            if _is_missing_table(e):
+                logger.warning("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
                 return None
             return None
     
@@ -143,7 +690,9 @@ class SupabaseService:
         user_id: str, 
         user_message: str, 
         ai_response: str,
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        create_session: bool = False,
+        created_at: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Log a chat message to the database
@@ -153,55 +702,205 @@ class SupabaseService:
             user_message: The user's original message
             ai_response: The AI's response
             session_id: The chat session ID (optional)
+            create_session: Create the session first, using session_id if given
+            created_at: Message timestamp in ISO format (optional - defaults to now)
             
         Returns:
-            Dictionary containing the logged message data
+            Dictionary containing the logged message data, plus session_created
+            (True if a session was created for this message) and session_title
+            (the created session's title, None otherwise)
         """
+        session_created = False
+        session_title = None
+        
+        # Create message record. The plain insert below is the fallback for databases
+        # without the performance migration, so id and created_at can't rely on its
+        # column defaults
+        message_data = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "user_message": user_message,
+            "ai_response": ai_response,
+            "created_at": created_at or utc_now()
+        }
+        
         try:
-            # If no session_id provided, try to create a new session
-            if not session_id:
+            # If no session_id provided (or a new one was requested), try to create a new session
+            if not session_id or create_session:
+                # Session and message are written in one database call when possible
+                stored_message = await self._log_message_with_session(
+                    user_id, user_message, ai_response, session_id, created_at
+                )
+                if stored_message is not None:
+                    return stored_message
+                
                 try:
                     # Generate a title from the user message (first 50 chars)
-                    title = user_message[:50] + "..." if len(user_message) > 50 else user_message
-                    session = await self.create_chat_session(user_id, title)
+                    title = make_session_title(user_message)
+                    session = await self.create_chat_session(user_id, title, session_id)
                     session_id = session["id"]
+                    session_created = True
+                    session_title = session["title"]
                 except Exception as session_error:
-                    print(f"Warning: Could not create session: {session_error}")
+                    logger.warning("Could not create session: %s", session_error)
                     # Continue without session_id for backward compatibility
                     session_id = None
             
-            # Create message record
-            message_data = {
-                "id": str(uuid.uuid4()),
-                "user_id": user_id,
-                "user_message": user_message,
-                "ai_response": ai_response,
-                "created_at": datetime.utcnow().isoformat() + "Z"
-            }
-            
             # Only add session_id if we have one
             if session_id:
                 message_data["session_id"] = session_id
             
             # Insert into chat_messages table
-            result = self.client.table("chat_messages").insert(message_data).execute()
+            result = await self._exec(self._messages_table.insert(message_data))
             
             if result.data:
-                print(f"Logged message to session {session_id if session_id else 'no session'}")
-                return result.data[0]
+                self._append_context(user_id, session_id, user_message, ai_response)
+                logger.debug("Logged message to session %s", session_id if session_id else "no session")
+                return {**result.data[0], "session_created": session_created, "session_title": session_title}
             else:
                 raise Exception("Failed to insert chat message")
                 
         except Exception as e:
             # Log error but don't fail the entire request
-            print(f"Error logging chat message: {str(e)}")
-            return message_data  # Return the data even if logging failed
+            logger.error("Error logging chat message: %s", e)
+            # Return the data even if logging failed
+            return {**message_data, "session_created": session_created, "session_title": session_title}
+    
+    async def _log_message_with_session(
+        self,
+        user_id: str,
+        user_message: str,
+        ai_response: str,
+        session_id: Optional[str] = None,
+        created_at: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Create a session and log its first message in one statement
+        
+        Runs one statement with a data-modifying CTE on the direct Postgres pool when
+        available, otherwise the log_message_with_session database function.
+        
+        Returns:
+            Dictionary containing the logged message data plus session_created and
+            session_title, or None if the performance migration hasn't been run
+            (callers should fall back to separate inserts)
+        """
+        title = make_session_title(user_message)
+        
+        if self.db_pool is not None:
+            async with self.db_pool.acquire() as con:
+                record = await con.fetchrow(
+                    _SQL_INSERT_MESSAGE_AUTOSESSION,
+                    UUID(session_id) if session_id else None,
+                    UUID(user_id),
+                    title,
+                    user_message,
+                    ai_response,
+                    datetime.fromisoformat(created_at.replace("Z", "+00:00")) if created_at else None
+                )
+            stored_message = {**_record_to_dict(record), "session_created": True, "session_title": title}
+            self._append_context(user_id, stored_message["session_id"], user_message, ai_response)
+            logger.debug("Logged message to new session %s", stored_message["session_id"])
+            return stored_message
+        
+        try:
+            result = await self._exec(self.client.rpc("log_message_with_session", {
+                "p_user_id": user_id,
+                "p_user_message": user_message,
+                "p_ai_response": ai_response,
+                "p_session_id": session_id,
+                "p_title": title,
+                "p_created_at": created_at
+            }))
+            
+        except Exception as e:
+            if _is_missing_function(e):
+                logger.warning("⚠️  log_message_with_session function doesn't exist. Please run the database migration.")
+                logger.warning("📋 Check the database-migration-performance.sql file for migration instructions.")
+                return None
+            raise e
+        
+        if not result.data:
+            raise Exception("Session does not belong to user")
+        
+        self._append_context(user_id, result.data[0]["session_id"], user_message, ai_response)
+        logger.debug("Logged message to session %s", result.data[0]["session_id"])
+        return result.data[0]
+    
+    async def log_chat_message_with_title(
+        self, 
+        user_id: str, 
+        session_id: str,
+        user_message: str, 
+        ai_response: str,
+        title: Optional[str] = None,
+        created_at: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Log a chat message to an existing session and optionally retitle it, in one call
+        
+        Uses the log_chat_and_title database function; falls back to separate
+        insert and update calls if the performance migration hasn't been run.
+        
+        Args:
+            user_id: The user's ID from Supabase auth
+            session_id: The chat session ID
+            user_message: The user's original message
+            ai_response: The AI's response
+            title: New title, applied only if the session still has the default title
+            created_at: Message timestamp in ISO format (optional - defaults to now)
+            
+        Returns:
+            Dictionary containing the logged message data, plus session_title
+            (the new title if it was applied, None otherwise)
+        """
+        message_data = {
+            "user_id": user_id,
+            "session_id": session_id,
+            "user_message": user_message,
+            "ai_response": ai_response,
+            "created_at": created_at
+        }
+        
+        try:
+            # A NULL p_created_at makes the database stamp it (and the message id)
+            result = await self._exec(self.client.rpc("log_chat_and_title", {
+                "p_user_id": user_id,
+                "p_session_id": session_id,
+                "p_user_message": user_message,
+                "p_ai_response": ai_response,
+                "p_title": title,
+                "p_created_at": created_at
+            }))
+            
+            if result.data:
+                self._append_context(user_id, session_id, user_message, ai_response)
+                logger.debug("Logged message to session %s", session_id)
+                return result.data[0]
+            else:
+                raise Exception("Session not found or does not belong to user")
+                
+        except Exception as e:
+            if _is_missing_function(e):
+                logger.warning("⚠️  log_chat_and_title function doesn't exist. Please run the database migration.")
+                logger.warning("📋 Check the database-migration-performance.sql file for migration instructions.")
+                stored_message = await self.log_chat_message(
+                    user_id, user_message, ai_response, session_id, created_at=created_at
+                )
+                title_updated = bool(title) and await self.update_session_title(session_id, user_id, title)
+                return {**stored_message, "session_title": title if title_updated else None}
+            
+            # Log error but don't fail the entire request
+            logger.error("Error logging chat message: %s", e)
+            return {**message_data, "session_title": None}
     
     async def get_chat_history(
         self, 
         user_id: str, 
         session_id: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[KeysetCursor] = None,
+        before: Optional[KeysetCursor] = None
     ) -> List[Dict[str, Any]]:
         """
         Retrieve chat history for a user
@@ -210,43 +909,56 @@ class SupabaseService:
             user_id: The user's ID from Supabase auth
             session_id: Specific session ID (optional - if None, gets all messages)
             limit: Maximum number of messages to retrieve
+            cursor: (created_at, id) of the last message on the previous page (optional)
+            before: (created_at, id) of the first message on the previous older page; only
+                older messages are returned, newest first from the database (optional -
+                pages backwards; not combined with cursor)
             
         Returns:
             List of chat messages ordered by creation time
         """
         try:
-            print(f"Querying chat history for user_id: {user_id}, session_id: {session_id}, limit: {limit}")
+            logger.debug("Querying chat history for user_id: %s, session_id: %s, limit: %s, cursor: %s, before: %s", user_id, session_id, limit, cursor, before)
             
-            query = self.client.table("chat_messages")\
-                .select("*")\
+            query = self._messages_table\
+                .select(_MSG_COLS)\
                 .eq("user_id", user_id)
             
             # Add session filter if provided
             if session_id:
                 query = query.eq("session_id", session_id)
             
-            result = query\
-                .order("created_at", desc=False)\
-                .limit(limit)\
-                .execute()
+            # Keyset pagination: continue after the previous page's last row. Batched
+            # messages can share a created_at, so the id breaks ties.
+            if cursor:
+                query = _keyset_filter(query, "created_at", cursor, "gt")
+            
+            # Backwards keyset pagination: the newest messages older than before
+            if before is not None:
+                query = _keyset_filter(query, "created_at", before, "lt")
+            
+            result = await self._exec(
+                _order_by(query, ("created_at", "id"), desc=before is not None)
+                .limit(limit)
+            )
             
-            print(f"Supabase query result: found {len(result.data) if result.data else 0} messages")
+            logger.debug("Supabase query result: found %d messages", len(result.data) if result.data else 0)
             
-            return result.data if result.data else []
+            messages = result.data if result.data else []
+            # Pages are always returned oldest first
+            return messages[::-1] if before is not None else messages
                 
         except Exception as e:
-            print(f"Error retrieving chat history: {str(e)}")
-            print(f"Exception type: {type(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error retrieving chat history: %s", e)
             return []
     
     async def get_recent_context(
         self, 
         user_id: str, 
         session_id: Optional[str] = None,
-        limit: int = 5
-    ) -> List[Dict[str, str]]:
+        limit: int = 5,
+        message_count: Optional[int] = None
+    ) -> ConversationContext:
         """
         Get recent conversation context for AI
         
@@ -254,32 +966,52 @@ class SupabaseService:
             user_id: The user's ID from Supabase auth
             session_id: Specific session ID (optional)
             limit: Number of recent messages to include
+            message_count: The session's current message_count from get_session_by_id
+                (optional - the in-process cache is only used when given, since it is
+                how entries written by other workers are detected)
             
         Returns:
-            List of message dictionaries for AI context
+            Tuple of (user messages, AI responses) in chronological order
         """
+        key = (user_id, session_id)
+        cacheable = session_id is not None and message_count is not None
+        cached = self._ctx_cache.get(key) if cacheable else None
+        if cached is not None and cached[0] >= limit and cached[2] == message_count:
+            # Fewer rows than the limit means this is the whole conversation
+            user_messages, ai_responses = cached[1]
+            return (user_messages[-limit:], ai_responses[-limit:]) if limit else EMPTY_CONTEXT
+        
         try:
-            query = self.client.table("chat_messages")\
-                .select("user_message, ai_response")\
-                .eq("user_id", user_id)
-            
-            if session_id:
-                query = query.eq("session_id", session_id)
-            
-            result = query\
-                .order("created_at", desc=True)\
-                .limit(limit)\
-                .execute()
-            
-            if result.data:
-                # Reverse to get chronological order
-                return list(reversed(result.data))
+            if self.db_pool is not None:
+                async with self.db_pool.acquire() as con:
+                    if session_id:
+                        records = await con.fetch(_SQL_RECENT_CONTEXT, UUID(user_id), UUID(session_id), limit)
+                    else:
+                        records = await con.fetch(_SQL_RECENT_CONTEXT_ALL, UUID(user_id), limit)
+                context = _to_context(records)
             else:
-                return []
+                query = self._messages_table\
+                    .select("user_message, ai_response")\
+                    .eq("user_id", user_id)
+                
+                if session_id:
+                    query = query.eq("session_id", session_id)
+                
+                result = await self._exec(
+                    query
+                    .order("created_at", desc=True)
+                    .limit(limit)
+                )
+                
+                context = _to_context(result.data or [])
+            
+            if cacheable:
+                self._ctx_cache[key] = [limit, context, message_count]
+            return context
                 
         except Exception as e:
-            print(f"Error retrieving conversation context: {str(e)}")
-            return []
+            logger.error("Error retrieving conversation context: %s", e)
+            return EMPTY_CONTEXT
     
     async def delete_session(
         self, 
@@ -297,27 +1029,28 @@ class SupabaseService:
             True if deletion was successful, False otherwise
         """
         try:
-            # Verify session belongs to user
-            session = await self.get_session_by_id(session_id, user_id)
-            if not session:
-                print(f"Session {session_id} not found or doesn't belong to user {user_id}")
-                return False
+            # Delete the session (messages will be cascade deleted); the user filter
+            # doubles as the ownership check, so no deleted rows means not found
+            result = await self._exec(
+                self._sessions_table
+                .delete(returning=ReturnMethod.representation)
+                .eq("id", session_id)
+                .eq("user_id", user_id)
+            )
             
-            # Delete the session (messages will be cascade deleted)
-            result = self.client.table("chat_sessions")\
-                .delete()\
-                .eq("id", session_id)\
-                .eq("user_id", user_id)\
-                .execute()
+            if not result.data:
+                logger.debug("Session %s not found or doesn't belong to user %s", session_id, user_id)
+                return False
             
-            print(f"Deleted session {session_id}")
+            self._invalidate_context(user_id, session_id)
+            logger.info("Deleted session %s", session_id)
             return True
                 
         except Exception as e:
-            print(f"Error deleting session {session_id}: {str(e)}")
+            logger.error("Error deleting session %s: %s", session_id, e)
             # If table doesn't exist, return False
-            if "does not exist" in str(e) or "relation" in str(e):
-                print("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
+            if _is_missing_table(e):
+                logger.warning("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
                 return False
             return False
     
@@ -332,32 +1065,34 @@ class SupabaseService:
             Number of sessions deleted
         """
         try:
-            # First get count of sessions to be deleted
-            count_result = self.client.table("chat_sessions")\
-                .select("id", count="exact")\
-                .eq("user_id", user_id)\
-                .execute()
+            # Delete all sessions for the user (messages will be cascade deleted),
+            # counting the deleted rows instead of counting first
+            if self.db_pool is not None:
+                async with self.db_pool.acquire() as con:
+                    deleted = await con.fetch(_SQL_DELETE_USER_SESSIONS, UUID(user_id))
+            else:
+                result = await self._exec(
+                    self._sessions_table
+                    .delete(returning=ReturnMethod.representation)
+                    .eq("user_id", user_id)
+                )
+                deleted = result.data or []
             
-            session_count = count_result.count if count_result.count is not None else 0
+            session_count = len(deleted)
             
             if session_count == 0:
-                print(f"No sessions found for user {user_id}")
+                logger.debug("No sessions found for user %s", user_id)
                 return 0
             
-            # Delete all sessions for the user (messages will be cascade deleted)
-            result = self.client.table("chat_sessions")\
-                .delete()\
-                .eq("user_id", user_id)\
-                .execute()
-            
-            print(f"Deleted {session_count} sessions for user {user_id}")
+            self._invalidate_context(user_id)
+            logger.info("Deleted %d sessions for user %s", session_count, user_id)
             return session_count
                 
         except Exception as e:
-            print(f"Error deleting all sessions for user {user_id}: {str(e)}")
+            logger.error("Error deleting all sessions for user %s: %s", user_id, e)
             # If table doesn't exist, return 0
-            if "does not exist" in str(e) or "relation" in str(e):
-                print("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
+            if _is_missing_table(e):
+                logger.warning("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
                 return 0
             raise e
     
@@ -379,28 +1114,86 @@ class SupabaseService:
             True if update was successful, False otherwise
         """
         try:
-            # Verify session belongs to user
-            session = await self.get_session_by_id(session_id, user_id)
-            if not session:
-                return False
+            # The user filter doubles as the ownership check, so no updated rows means not found
+            result = await self._exec(
+                self._sessions_table
+                # updated_at is set by the update_chat_sessions_updated_at trigger
+                .update({"title": new_title}, returning=ReturnMethod.representation)
+                .eq("id", session_id)
+                .eq("user_id", user_id)
+            )
             
-            result = self.client.table("chat_sessions")\
-                .update({"title": new_title, "updated_at": datetime.utcnow().isoformat() + "Z"})\
-                .eq("id", session_id)\
-                .eq("user_id", user_id)\
-                .execute()
+            if not result.data:
+                return False
             
-            print(f"Updated session {session_id} title to: {new_title}")
+            logger.info("Updated session %s title to: %s", session_id, new_title)
             return True
                 
         except Exception as e:
-            print(f"Error updating session title: {str(e)}")
+            logger.error("Error updating session title: %s", e)
             # If table doesn't exist, return False
-            if "does not exist" in str(e) or "relation" in str(e):
-                print("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
+            if _is_missing_table(e):
+                logger.warning("⚠️  chat_sessions table doesn't exist. Please run the database migration.")
                 return False
             return False
     
+    def validate_user_token_local(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Verify a Supabase JWT locally without a network round-trip
+        
+        Args:
+            token: JWT token from frontend
+            
+        Returns:
+            User info dictionary if the signature and claims are valid, None if the
+            token cannot be verified locally because there is no key for its
+            algorithm (callers should fall back to validate_user_token)
+            
+        Raises:
+            JWTError: If the token was checked locally and is invalid or expired
+        """
+        algorithm = jwt.get_unverified_header(token).get("alg")
+        
+        if algorithm == "HS256":
+            if not settings.SUPABASE_JWT_SECRET:
+                return None
+            key = settings.SUPABASE_JWT_SECRET
+        elif algorithm in _JWKS_ALGORITHMS and self.jwks:
+            key = self.jwks
+        else:
+            return None
+        
+        try:
+            payload = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience="authenticated"
+            )
+            
+            return {
+                "id": payload["sub"],
+                "email": payload.get("email")
+            }
+                
+        except JWTError:
+            raise
+        except (JOSEError, ValueError, KeyError) as e:
+            # Malformed keys or claims are reported as invalid tokens too
+            raise JWTError(f"Invalid token: {e}") from e
+    
+    def get_token_expiry(self, token: str) -> float:
+        """
+        Read a JWT's exp claim without verifying it (only call after the token was validated)
+        
+        Returns:
+            Expiry as a Unix timestamp, or infinity if the token has no exp claim
+        """
+        try:
+            return float(jwt.get_unverified_claims(token).get("exp", float("inf")))
+        except (JWTError, TypeError, ValueError):
+            return float("inf")
+    
     def validate_user_token(self, token: str) -> Optional[Dict[str, Any]]:
         """
         Validate Supabase JWT token and extract user info
@@ -425,8 +1218,10 @@ class SupabaseService:
                 return None
                 
         except Exception as e:
-            print(f"Error validating user token: {str(e)}")
+            logger.error("Error validating user token: %s", e)
             return None
 
-# Create global service instance
-supabase_service = SupabaseService() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_supabase_service() -> SupabaseService:
+    """Get the shared service instance, creating its client on first use"""
+    return SupabaseService() 
\ No newline at end of file
@@ -4,22 +4,42 @@ CoutAI Backend Server Runner
 
 This script starts the FastAPI backend server for the CoutAI application.
 Make sure to set up your environment variables before running.
+
+With ENV=dev the server runs a single auto-reloading process. Any other ENV
+starts one worker process per CPU core. Each worker has its own Supabase and
+Postgres connection pools and its own in-process caches (validated tokens and
+recent conversation context), so those are not shared between workers - set
+REDIS_URL to share conversation context across them.
 """
 
+import os
+import sys
 import uvicorn
 from app.config import settings
 
-if __name__ == "__main__":
+def main() -> None:
+    """Start uvicorn for the current ENV (also used by python -m app.main)"""
+    dev_mode = settings.ENV == "dev"
+    workers = 1 if dev_mode else max(2, os.cpu_count() or 1)
+
     print("🚀 Starting CoutAI Backend Server...")
     print(f"📍 Server: http://{settings.HOST}:{settings.PORT}")
     print(f"📚 API Docs: http://{settings.HOST}:{settings.PORT}/docs")
-    print(f"🔄 Auto-reload: Enabled")
+    print(f"🔄 Auto-reload: {'Enabled' if dev_mode else 'Disabled'}")
+    print(f"👷 Workers: {workers}")
     print("-" * 50)
-    
+
     uvicorn.run(
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=True,
-        log_level="info"
-    ) 
\ No newline at end of file
+        reload=dev_mode,
+        workers=workers,
+        # uvloop isn't available on Windows
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        log_level=settings.LOG_LEVEL.lower()
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+
+# Settings are read once at import, so placeholder credentials must be set first
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test.service.key")
+os.environ.setdefault("REDIS_URL", "")
+os.environ.setdefault("DATABASE_URL", "")
+
+import re
+from typing import Any, Dict, List
+
+import httpx
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.supabase_service as supabase_service
+from app.main import app
+from app.routers.chat import get_current_user
+
+USER_ID = "00000000-0000-0000-0000-00000000000a"
+
+_KEYSET_RE = re.compile(r'\((\w+)\.(lt|gt)\."(.+)",and\(\1\.eq\."(.+)",id\.\2\.(.+)\)\)')
+_COMPARE = {
+    "eq": lambda value, criteria: str(value) == criteria,
+    "lt": lambda value, criteria: str(value) < criteria,
+    "gt": lambda value, criteria: str(value) > criteria,
+}
+
+
+class FakePostgrest:
+    """
+    In-memory stand-in for PostgREST, covering the filters the service sends
+
+    Timestamps are compared as strings, so test rows must share one format.
+    """
+
+    def __init__(self) -> None:
+        self.tables: Dict[str, List[Dict[str, Any]]] = {"chat_sessions": [], "chat_messages": []}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        table = request.url.path.rsplit("/", 1)[-1]
+        params = request.url.params
+        rows = list(self.tables[table])
+
+        for key, value in params.multi_items():
+            if key == "or":
+                match = _KEYSET_RE.fullmatch(value)
+                assert match, value
+                column, operator, timestamp, _, row_id = match.groups()
+                rows = [
+                    row for row in rows
+                    if _COMPARE[operator](row[column], timestamp)
+                    or (row[column] == timestamp and _COMPARE[operator](row["id"], row_id))
+                ]
+            elif key not in ("select", "order", "limit") and "." not in key:
+                operator, _, criteria = value.partition(".")
+                rows = [row for row in rows if _COMPARE[operator](row[key], criteria)]
+
+        # PostgREST only honours one order parameter
+        assert len(params.get_list("order")) <= 1
+        for column in reversed(params.get("order", "").split(",") if "order" in params else []):
+            name, _, direction = column.partition(".")
+            rows.sort(key=lambda row: row[name], reverse=direction == "desc")
+
+        total = len(rows)
+        rows = rows[:int(params["limit"])] if "limit" in params else rows
+        select = params.get("select", "")
+        body = []
+        for row in rows:
+            if "chat_messages(count)" in select:
+                messages = [message for message in self.tables["chat_messages"] if message["session_id"] == row["id"]]
+                row = {**row, "chat_messages": [{"count": len(messages)}]}
+                if "last_message:" in select:
+                    newest = sorted(messages, key=lambda message: message["created_at"])[-1:]
+                    row["last_message"] = [
+                        {"user_message": message["user_message"], "ai_response": message["ai_response"]}
+                        for message in newest
+                    ]
+            body.append(row)
+        return httpx.Response(
+            200,
+            content=orjson.dumps(body),
+            headers={"Content-Type": "application/json", "Content-Range": f"0-{max(len(rows) - 1, 0)}/{total}"}
+        )
+
+
+@pytest.fixture
+def postgrest(monkeypatch) -> FakePostgrest:
+    """Route the Supabase service's PostgREST session to a FakePostgrest"""
+    fake = FakePostgrest()
+    transport = httpx.MockTransport(fake)
+    monkeypatch.setattr(supabase_service.httpx, "HTTPTransport", lambda **kwargs: transport)
+    supabase_service.get_supabase_service.cache_clear()
+    yield fake
+    supabase_service.get_supabase_service.cache_clear()
+
+
+@pytest.fixture
+def client(postgrest) -> TestClient:
+    """Test client signed in as USER_ID, backed by the postgrest fixture"""
+    app.dependency_overrides[get_current_user] = lambda: {"id": USER_ID, "email": "user@example.com"}
+    # Not entered as a context manager, so startup (Redis, JWKS, Postgres pool) is skipped
+    yield TestClient(app)
+    app.dependency_overrides.clear()
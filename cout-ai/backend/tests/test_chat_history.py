@@ -0,0 +1,60 @@
+from typing import List
+
+import pytest
+
+from app.routers.chat import NEXT_CURSOR_HEADER
+from tests.conftest import USER_ID
+
+SESSION_ID = "00000000-0000-0000-0000-000000000001"
+
+# Five messages, three of them written by one batch with the same created_at
+MESSAGES = [
+    {"id": f"00000000-0000-0000-0000-0000000000b{n}", "user_id": USER_ID, "session_id": SESSION_ID,
+     "user_message": f"question {n}", "ai_response": f"answer {n}", "created_at": created_at}
+    for n, created_at in [
+        (1, "2024-01-01T00:00:00+00:00"),
+        (2, "2024-01-02T00:00:00+00:00"),
+        (3, "2024-01-02T00:00:00+00:00"),
+        (4, "2024-01-02T00:00:00+00:00"),
+        (5, "2024-01-03T00:00:00+00:00"),
+    ]
+]
+OLDEST_FIRST = [message["id"] for message in sorted(MESSAGES, key=lambda row: (row["created_at"], row["id"]))]
+
+
+def _follow(client, param: str, start: dict) -> List[List[str]]:
+    """Request pages of /history, following X-Next-Cursor through the given parameter"""
+    pages: List[List[str]] = []
+    params = {"limit": 2, **start}
+    while len(pages) < len(MESSAGES):
+        response = client.get("/api/chat/history", params=params)
+        assert response.status_code == 200
+        pages.append([message["id"] for message in response.json()])
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params[param] = response.headers[NEXT_CURSOR_HEADER]
+    return pages
+
+
+def test_history_pages_forward_across_tied_timestamps(client, postgrest):
+    postgrest.tables["chat_messages"] = MESSAGES
+    pages = _follow(client, "cursor", {})
+    assert [message_id for page in pages for message_id in page] == OLDEST_FIRST
+
+
+def test_history_pages_backwards_across_tied_timestamps(client, postgrest):
+    postgrest.tables["chat_messages"] = MESSAGES
+    pages = _follow(client, "before", {"before": "2100-01-01T00:00:00+00:00"})
+    # Each page is oldest first, and each later page is older than the one before
+    assert [message_id for page in reversed(pages) for message_id in page] == OLDEST_FIRST
+
+
+@pytest.mark.parametrize("params", [
+    {"cursor": "not-a-timestamp"},
+    {"cursor": "2024-01-02T00:00:00+00:00,not-a-uuid"},
+    {"before": "2024-01-02T00:00:00+00:00)"},
+    {"cursor": "2024-01-02T00:00:00+00:00", "before": "2024-01-03T00:00:00+00:00"},
+])
+def test_invalid_history_cursors_are_rejected(client, params):
+    response = client.get("/api/chat/history", params=params)
+    assert response.status_code == 400
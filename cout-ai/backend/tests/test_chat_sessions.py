@@ -0,0 +1,65 @@
+from typing import List
+
+from app.routers.chat import NEXT_CURSOR_HEADER
+from tests.conftest import USER_ID
+
+# Five sessions, three of them bumped to the same updated_at by one message batch
+SESSIONS = [
+    {"id": f"00000000-0000-0000-0000-00000000000{n}", "user_id": USER_ID, "title": f"Chat {n}",
+     "created_at": "2024-01-01T00:00:00+00:00", "updated_at": updated_at}
+    for n, updated_at in [
+        (1, "2024-01-03T00:00:00+00:00"),
+        (2, "2024-01-02T00:00:00+00:00"),
+        (3, "2024-01-02T00:00:00+00:00"),
+        (4, "2024-01-02T00:00:00+00:00"),
+        (5, "2024-01-01T00:00:00+00:00"),
+    ]
+]
+
+
+def test_sessions_follow_next_cursor_across_tied_timestamps(client, postgrest):
+    postgrest.tables["chat_sessions"] = SESSIONS
+    seen: List[str] = []
+    params = {"limit": 2}
+
+    for _ in range(len(SESSIONS)):
+        response = client.get("/api/chat/sessions", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert page, f"empty page after cursor {params.get('cursor')}"
+        seen.extend(session["id"] for session in page)
+
+        if NEXT_CURSOR_HEADER not in response.headers or len(seen) == len(SESSIONS):
+            break
+        params["cursor"] = response.headers[NEXT_CURSOR_HEADER]
+
+    assert seen == [session["id"] for session in sorted(
+        SESSIONS, key=lambda row: (row["updated_at"], row["id"]), reverse=True
+    )]
+
+
+def test_malformed_session_cursor_is_rejected(client):
+    response = client.get("/api/chat/sessions", params={"cursor": "yesterday"})
+    assert response.status_code == 400
+
+
+def test_session_previews_carry_the_latest_message(client, postgrest):
+    postgrest.tables["chat_sessions"] = SESSIONS
+    postgrest.tables["chat_messages"] = [
+        {"id": f"00000000-0000-0000-0000-0000000000b{n}", "user_id": USER_ID, "session_id": SESSIONS[3]["id"],
+         "user_message": f"question {n}", "ai_response": f"answer {n}", "created_at": f"2024-01-02T00:00:0{n}+00:00"}
+        for n in (1, 2)
+    ]
+
+    response = client.get("/api/chat/sessions", params={"limit": 2, "preview": True})
+    assert response.status_code == 200
+    newest, with_messages = response.json()
+    assert (newest["last_user_message"], newest["message_count"]) == (None, 0)
+    assert (with_messages["last_user_message"], with_messages["last_ai_response"]) == ("question 2", "answer 2")
+    assert with_messages["message_count"] == 2
+
+    # Previews page with the same cursor as the plain list
+    page = client.get("/api/chat/sessions", params={
+        "limit": 2, "preview": True, "cursor": response.headers[NEXT_CURSOR_HEADER]
+    }).json()
+    assert [session["id"] for session in page] == [SESSIONS[2]["id"], SESSIONS[1]["id"]]
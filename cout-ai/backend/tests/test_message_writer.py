@@ -0,0 +1,27 @@
+import asyncio
+from typing import List
+
+import httpx
+import orjson
+
+import app.services.supabase_service as supabase_service
+
+USER_ID = "00000000-0000-0000-0000-00000000000a"
+SESSION_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def test_messages_queued_without_a_writer_still_bump_the_session(monkeypatch):
+    requests: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=orjson.dumps(1), headers={"Content-Type": "application/json"})
+
+    monkeypatch.setattr(supabase_service.httpx, "HTTPTransport", lambda **kwargs: httpx.MockTransport(handler))
+    service = supabase_service.SupabaseService()
+
+    message = asyncio.run(service.queue_chat_message(USER_ID, SESSION_ID, "question", "answer"))
+
+    # Written right away by log_chat_messages, which also updates chat_sessions.updated_at
+    assert [request.url.path for request in requests] == ["/rest/v1/rpc/log_chat_messages"]
+    assert orjson.loads(requests[0].content)["p_messages"] == [message]
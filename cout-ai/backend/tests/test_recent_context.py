@@ -0,0 +1,51 @@
+import asyncio
+from typing import List
+
+import httpx
+import orjson
+import pytest
+
+import app.services.supabase_service as supabase_service
+
+USER_ID = "00000000-0000-0000-0000-00000000000a"
+SESSION_ID = "00000000-0000-0000-0000-000000000001"
+
+
+@pytest.fixture
+def service(monkeypatch):
+    requests: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        rows = [{"user_message": f"question {len(requests)}", "ai_response": f"answer {len(requests)}"}]
+        return httpx.Response(200, content=orjson.dumps(rows), headers={"Content-Type": "application/json"})
+
+    monkeypatch.setattr(supabase_service.httpx, "HTTPTransport", lambda **kwargs: httpx.MockTransport(handler))
+    service = supabase_service.SupabaseService()
+    service.requests = requests
+    return service
+
+
+def test_cached_context_is_refetched_when_the_session_has_new_messages(service):
+    async def context(message_count):
+        return await service.get_recent_context(USER_ID, SESSION_ID, limit=5, message_count=message_count)
+
+    first = asyncio.run(context(1))
+    assert asyncio.run(context(1)) == first
+    assert len(service.requests) == 1
+
+    # Another worker logged a turn, so the session row now counts one more message
+    assert asyncio.run(context(2)) != first
+    assert len(service.requests) == 2
+
+
+def test_turns_logged_here_keep_the_cached_context_current(service):
+    asyncio.run(service.get_recent_context(USER_ID, SESSION_ID, limit=5, message_count=1))
+    service._append_context(USER_ID, SESSION_ID, "follow-up", "reply")
+
+    user_messages, ai_responses = asyncio.run(
+        service.get_recent_context(USER_ID, SESSION_ID, limit=5, message_count=2)
+    )
+    assert user_messages == ("question 1", "follow-up")
+    assert ai_responses == ("answer 1", "reply")
+    assert len(service.requests) == 1
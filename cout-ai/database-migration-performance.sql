@@ -0,0 +1,265 @@
+-- =====================================================
+-- Cout.AI Chat Performance Migration
+-- =====================================================
+-- This migration adds database functions and indexes used by the backend
+-- to cut round-trips on the chat hot path
+-- Run this in Supabase SQL Editor after database-migration.sql
+
+-- =====================================================
+-- Log a message and set the session title in one call
+-- =====================================================
+
+-- Inserts the chat message and, when p_title is given and the session still has
+-- the default title, renames the session - replacing separate INSERT and UPDATE calls.
+-- session_title is the new title if one was applied, NULL otherwise.
+-- Returns no row if the session does not exist or belong to the user.
+-- Earlier versions took a p_message_id; drop that overload so calls aren't ambiguous.
+DROP FUNCTION IF EXISTS log_chat_and_title(UUID, UUID, TEXT, TEXT, TEXT, UUID, TIMESTAMPTZ);
+CREATE OR REPLACE FUNCTION log_chat_and_title(
+    p_user_id UUID,
+    p_session_id UUID,
+    p_user_message TEXT,
+    p_ai_response TEXT,
+    p_title TEXT DEFAULT NULL,
+    p_created_at TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    user_id UUID,
+    session_id UUID,
+    user_message TEXT,
+    ai_response TEXT,
+    created_at TIMESTAMPTZ,
+    session_title VARCHAR(255)
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_message chat_messages%ROWTYPE;
+    v_title VARCHAR(255);
+BEGIN
+    INSERT INTO chat_messages (user_id, session_id, user_message, ai_response, created_at)
+    SELECT
+        p_user_id,
+        p_session_id,
+        p_user_message,
+        p_ai_response,
+        COALESCE(p_created_at, NOW())
+    WHERE EXISTS (
+        SELECT 1 FROM chat_sessions s
+        WHERE s.id = p_session_id AND s.user_id = p_user_id
+    )
+    RETURNING * INTO v_message;
+
+    IF v_message.id IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- One UPDATE per message: bumps updated_at (via update_chat_sessions_updated_at)
+    -- and applies the first-message title, replacing the old message-count trigger
+    SELECT s.title INTO v_title FROM chat_sessions s WHERE s.id = p_session_id FOR UPDATE;
+
+    IF p_title IS NOT NULL AND v_title = 'New Chat' THEN
+        v_title := p_title;
+    ELSE
+        p_title := NULL;
+    END IF;
+
+    UPDATE chat_sessions s
+    SET title = v_title
+    WHERE s.id = p_session_id;
+
+    IF p_title IS NULL THEN
+        v_title := NULL;
+    END IF;
+
+    RETURN QUERY SELECT
+        v_message.id::UUID,
+        v_message.user_id::UUID,
+        v_message.session_id::UUID,
+        v_message.user_message::TEXT,
+        v_message.ai_response::TEXT,
+        v_message.created_at::TIMESTAMPTZ,
+        v_title;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- Create a session and log its first message in one call
+-- =====================================================
+
+-- Creates the session (with p_session_id, or a generated id) and inserts the
+-- message in the same transaction - replacing separate session and message INSERTs.
+-- If p_session_id already belongs to the user the message is added to it instead.
+-- session_created is TRUE if the session was created; session_title is its title
+-- in that case, NULL otherwise.
+-- Returns no row if p_session_id exists but does not belong to the user.
+-- Earlier versions took a p_message_id; drop that overload so calls aren't ambiguous.
+DROP FUNCTION IF EXISTS log_message_with_session(UUID, TEXT, TEXT, UUID, TEXT, UUID, TIMESTAMPTZ);
+CREATE OR REPLACE FUNCTION log_message_with_session(
+    p_user_id UUID,
+    p_user_message TEXT,
+    p_ai_response TEXT,
+    p_session_id UUID DEFAULT NULL,
+    p_title TEXT DEFAULT NULL,
+    p_created_at TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    user_id UUID,
+    session_id UUID,
+    user_message TEXT,
+    ai_response TEXT,
+    created_at TIMESTAMPTZ,
+    session_created BOOLEAN,
+    session_title VARCHAR(255)
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_session_id UUID := COALESCE(p_session_id, gen_random_uuid());
+    v_title VARCHAR(255) := COALESCE(p_title, left(btrim(p_user_message), 50));
+    v_created BOOLEAN;
+    v_message chat_messages%ROWTYPE;
+BEGIN
+    INSERT INTO chat_sessions (id, user_id, title)
+    VALUES (v_session_id, p_user_id, v_title)
+    ON CONFLICT (id) DO NOTHING;
+    v_created := FOUND;
+
+    IF NOT v_created THEN
+        -- Existing session: must be the caller's; bump updated_at like log_chat_and_title
+        UPDATE chat_sessions s
+        SET updated_at = NOW()
+        WHERE s.id = v_session_id AND s.user_id = p_user_id;
+
+        IF NOT FOUND THEN
+            RETURN;
+        END IF;
+    END IF;
+
+    INSERT INTO chat_messages (user_id, session_id, user_message, ai_response, created_at)
+    VALUES (
+        p_user_id,
+        v_session_id,
+        p_user_message,
+        p_ai_response,
+        COALESCE(p_created_at, NOW())
+    )
+    RETURNING * INTO v_message;
+
+    RETURN QUERY SELECT
+        v_message.id::UUID,
+        v_message.user_id::UUID,
+        v_message.session_id::UUID,
+        v_message.user_message::TEXT,
+        v_message.ai_response::TEXT,
+        v_message.created_at::TIMESTAMPTZ,
+        v_created,
+        CASE WHEN v_created THEN v_title END;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- Log a batch of messages in one call
+-- =====================================================
+
+-- Inserts queued messages for existing sessions in a single statement and bumps
+-- updated_at on every session that received one. p_messages is a JSON array of
+-- {id, user_id, session_id, user_message, ai_response, created_at} objects;
+-- messages whose session does not belong to their user are skipped.
+-- Returns the number of messages inserted.
+CREATE OR REPLACE FUNCTION log_chat_messages(p_messages JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH inserted AS (
+        INSERT INTO chat_messages (id, user_id, session_id, user_message, ai_response, created_at)
+        SELECT
+            COALESCE(m.id, gen_random_uuid()),
+            m.user_id,
+            m.session_id,
+            m.user_message,
+            m.ai_response,
+            COALESCE(m.created_at, NOW())
+        FROM jsonb_to_recordset(p_messages) AS m(
+            id UUID,
+            user_id UUID,
+            session_id UUID,
+            user_message TEXT,
+            ai_response TEXT,
+            created_at TIMESTAMPTZ
+        )
+        WHERE EXISTS (
+            SELECT 1 FROM chat_sessions s
+            WHERE s.id = m.session_id AND s.user_id = m.user_id
+        )
+        RETURNING chat_messages.session_id
+    ), touched AS (
+        UPDATE chat_sessions s
+        SET updated_at = NOW()
+        WHERE s.id IN (SELECT DISTINCT session_id FROM inserted)
+    )
+    SELECT count(*) INTO v_count FROM inserted;
+
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- Compute message_count on read instead of per insert
+-- =====================================================
+
+-- The backend now reads message counts with an embedded count
+-- (select=*,chat_messages(count)) and log_chat_and_title bumps updated_at itself,
+-- so every message insert no longer pays for an extra trigger UPDATE.
+-- chat_sessions.message_count is left in place but is no longer maintained.
+DROP TRIGGER IF EXISTS update_session_message_count_trigger ON chat_messages;
+
+-- =====================================================
+-- Server-side id and timestamp defaults
+-- =====================================================
+
+-- The backend leaves created_at/updated_at out of inserts and updates unless it
+-- needs a specific value, so make sure chat_messages stamps its own rows too
+-- (chat_sessions already defaults both to NOW() and keeps updated_at current via
+-- update_chat_sessions_updated_at)
+ALTER TABLE chat_messages ALTER COLUMN created_at SET DEFAULT NOW();
+
+-- Ids are generated in the database and read back from the inserted row
+-- (new sessions started from a chat turn still send the id the response used)
+ALTER TABLE chat_sessions ALTER COLUMN id SET DEFAULT gen_random_uuid();
+ALTER TABLE chat_messages ALTER COLUMN id SET DEFAULT gen_random_uuid();
+
+-- =====================================================
+-- Keyset pagination indexes
+-- =====================================================
+
+-- Serve "WHERE user_id = ? [AND session_id = ?] AND created_at > ? ORDER BY created_at"
+-- and "WHERE user_id = ? AND updated_at < ? ORDER BY updated_at DESC" as index range scans
+CREATE INDEX IF NOT EXISTS idx_chat_messages_user_session_created
+    ON chat_messages (user_id, session_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_user_created
+    ON chat_messages (user_id, created_at DESC);
+-- (the session side is served by idx_chat_sessions_user_updated_covering below)
+
+-- =====================================================
+-- Covering index for session lists
+-- =====================================================
+
+-- The session list and its ETag version check read only id, title, created_at and
+-- updated_at by user, so carrying the rest in the index makes them index-only scans.
+-- Replaces idx_chat_sessions_user_updated from earlier runs of this migration.
+-- On a large, live table, run the CREATE on its own as CREATE INDEX CONCURRENTLY
+-- (it can't run inside a transaction).
+--
+-- chat_messages deliberately gets no covering index: user_message/ai_response can
+-- exceed the ~2.7 kB B-tree entry limit, which would make long messages fail to
+-- insert. get_recent_context reads at most a handful of rows via
+-- idx_chat_messages_user_session_created, so its heap fetches stay small.
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_updated_covering
+    ON chat_sessions (user_id, updated_at DESC) INCLUDE (id, title, created_at);
+DROP INDEX IF EXISTS idx_chat_sessions_user_updated;
+
+-- =====================================================
+-- Migration Complete
+-- =====================================================